@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+
+"""
+    Animation controller sliding a window, reused for every slide.
+
+    Frames are driven by a QTimer at the configured frame rate cap, each
+    moving the window to the eased position for the time elapsed, so that a
+    late frame catches up rather than slowing the slide down. Modes:
+        normal      slides for the configured duration and easing
+        reduced     short linear slide of a few frames, for slow machines
+        instant     moves at once, eg. for VNC sessions
+    The frame timings of the last slides are kept, and logged for each one.
+"""
+
+import time
+import collections
+
+from PyQt4 import QtCore
+
+__version__ = "11.09.06.14.38"
+
+
+easing_curves = {'linear' : QtCore.QEasingCurve.Linear,
+                 'in-quad' : QtCore.QEasingCurve.InQuad,
+                 'out-quad' : QtCore.QEasingCurve.OutQuad,
+                 'in-out-quad' : QtCore.QEasingCurve.InOutQuad,
+                 'in-cubic' : QtCore.QEasingCurve.InCubic,
+                 'out-cubic' : QtCore.QEasingCurve.OutCubic,
+                 'in-out-cubic' : QtCore.QEasingCurve.InOutCubic,
+                 'out-expo' : QtCore.QEasingCurve.OutExpo,
+                 'in-out-sine' : QtCore.QEasingCurve.InOutSine}
+
+# reduced motion bounds
+REDUCED_DURATION = 100
+REDUCED_FPS = 20
+
+
+
+class SlideRecord(object):
+
+    """
+        Frame timings of one slide, in ms.
+    """
+
+    def __init__(self, duration, frame_interval):
+        self.duration = duration
+        self.frame_interval = frame_interval
+        # from the slide request to the first frame
+        self.latency = None
+        self.intervals = []
+
+    def dropped(self):
+
+        """
+            Returns the number of frames missed, counting each interval
+            longer than the frame interval by half of one.
+        """
+
+        return sum(max(int(interval / self.frame_interval - 0.5), 0)
+                   for interval in self.intervals)
+
+    def summary(self):
+        if not self.intervals:
+            return 'slide of %d ms: no frames' % self.duration
+        return ('slide of %d ms: %d frames, first after %.1f ms, '
+                '%.1f ms mean and %.1f ms max interval, %d dropped' %
+                (self.duration, len(self.intervals) + 1, self.latency,
+                 sum(self.intervals) / len(self.intervals),
+                 max(self.intervals), self.dropped()))
+
+
+
+class AnimationController(QtCore.QObject):
+
+    """
+        Slides a widget to a position and emits finished() when it is
+        there. A new slide stops the one in progress and starts from where
+        the widget is.
+    """
+
+    def __init__(self, widget, configuration, logger, history=50):
+        QtCore.QObject.__init__(self, widget)
+        self.widget = widget
+        self.logger = logger
+
+        self.timer = QtCore.QTimer(self)
+        self.connect(self.timer, QtCore.SIGNAL('timeout()'), self.frame)
+
+        # the last slides, latest last
+        self.records = collections.deque(maxlen=history)
+        self.record = None
+        self.configure(configuration)
+
+
+    def configure(self, configuration):
+
+        """
+            Applies the animation section of the configuration, from the next
+            slide on.
+        """
+
+        self.mode = configuration.mode
+        self.duration = configuration.duration
+        self.fps = configuration.fps
+        self.easing = QtCore.QEasingCurve(easing_curves[configuration.easing])
+        if self.mode == 'reduced':
+            self.duration = min(self.duration, REDUCED_DURATION)
+            self.fps = min(self.fps, REDUCED_FPS)
+            self.easing = QtCore.QEasingCurve(QtCore.QEasingCurve.Linear)
+        self.timer.setInterval(1000 / self.fps)
+
+
+    def is_instant(self):
+        return self.mode == 'instant' or self.duration == 0
+
+
+    def is_running(self):
+        return self.timer.isActive()
+
+
+    def slide(self, target, fraction=1.0):
+
+        """
+            Slides the widget from its position to target, in the fraction
+            of the configured duration given.
+        """
+
+        self.stop()
+        if self.is_instant():
+            self.widget.move(target)
+            self.emit(QtCore.SIGNAL('finished()'))
+            return
+
+        self.start_position = self.widget.pos()
+        self.target = target
+        self.slide_duration = max(self.duration * fraction, 1) / 1000.0
+        self.started = time.time()
+        self.last_frame = None
+        self.record = SlideRecord(self.slide_duration * 1000,
+                                  1000.0 / self.fps)
+        self.timer.start()
+
+
+    def stop(self):
+
+        """
+            Stops the slide in progress where it is, without finished().
+        """
+
+        if self.timer.isActive():
+            self.timer.stop()
+            self.end_record()
+
+
+    def frame(self):
+        now = time.time()
+        if self.last_frame is None:
+            self.record.latency = (now - self.started) * 1000
+        else:
+            self.record.intervals.append((now - self.last_frame) * 1000)
+        self.last_frame = now
+
+        progress = min((now - self.started) / self.slide_duration, 1.0)
+        eased = self.easing.valueForProgress(progress)
+        self.widget.move(self.start_position +
+                         (self.target - self.start_position) * eased)
+
+        if progress >= 1.0:
+            self.timer.stop()
+            self.end_record()
+            self.emit(QtCore.SIGNAL('finished()'))
+
+
+    def end_record(self):
+        self.records.append(self.record)
+        self.logger.info('Dashboard %s.', self.record.summary())
+        self.record = None
@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+
+"""
+    File-drop indicator channel of Qontrol.
+
+    Outside scripts set the indicator of a page by writing a small file named
+    after the page in ~/.qontrol/ind, best written aside and renamed in place:
+        echo 3 > ~/.qontrol/ind/.Log && mv ~/.qontrol/ind/.Log ~/.qontrol/ind/Log
+    The file holds a badge count, a text, or a json object with any of the
+    keys "count", "urgency" and "text". Each file is the whole state of the
+    indicator, what it leaves out is reset. Removing the file resets the
+    indicator. Files whose name starts with a dot are ignored.
+    The directory is watched with inotify, or QFileSystemWatcher where it is
+    not available, never polled.
+"""
+
+import os
+import json
+
+from PyQt4 import QtCore
+
+import inotify
+
+__version__ = "11.09.06.14.38"
+
+
+# largest file read, indicator files are meant to be small
+MAX_SIZE = 4096
+
+# state of an indicator without file, and of what a file leaves out
+reset_state = {'count' : 0, 'urgency' : 'none', 'text' : ''}
+
+watched_events = inotify.IN_CLOSE_WRITE | inotify.IN_MOVED_TO | \
+                 inotify.IN_MOVED_FROM | inotify.IN_DELETE | inotify.IN_ONLYDIR
+
+
+
+class IndicatorChannel(QtCore.QObject):
+
+    """
+        Watches the indicator directory and posts the state read from its
+        files to the indicators of the pages they are named after.
+    """
+
+    def __init__(self, parent, directory, logger):
+        QtCore.QObject.__init__(self, parent)
+        self.application = parent
+        self.directory = directory
+        self.logger = logger
+        # name: (modification time, size) of the files read
+        self.seen = {}
+        self.inotify = None
+
+        if not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError as error:
+                self.logger.error('Indicator channel disabled, cannot make %s: '
+                                  '%s', directory, error)
+                return
+
+        try:
+            self.inotify = inotify.Inotify()
+            self.inotify.add_watch(directory, watched_events)
+        except OSError as error:
+            if self.inotify is not None:
+                self.inotify.close()
+                self.inotify = None
+            self.logger.warn('No inotify (%s), indicator channel uses '
+                             'QFileSystemWatcher.', error)
+            self.watcher = QtCore.QFileSystemWatcher([directory], self)
+            self.connect(self.watcher,
+                         QtCore.SIGNAL('directoryChanged(QString)'),
+                         lambda path: self.scan())
+        else:
+            self.notifier = QtCore.QSocketNotifier(self.inotify.fd,
+                                                   QtCore.QSocketNotifier.Read,
+                                                   self)
+            self.connect(self.notifier, QtCore.SIGNAL('activated(int)'),
+                         self.read_events)
+
+        # files dropped while Qontrol was not running
+        self.scan()
+        self.logger.info('Indicator channel watching %s.', directory)
+
+
+    def read_events(self):
+
+        """
+            Reads the queued inotify events and updates each indicator named
+            once, however many events it got.
+        """
+
+        try:
+            events = self.inotify.read_events()
+        except OSError as error:
+            # events may be lost, the directory tells the current state
+            self.logger.warn('Indicator channel could not read inotify '
+                             'events: %s', error)
+            self.scan()
+            return
+
+        names = set()
+        for descriptor, mask, cookie, name in events:
+            if mask & inotify.IN_Q_OVERFLOW:
+                # events were lost, the directory tells the current state
+                self.scan()
+                return
+            if name and not name.startswith('.'):
+                names.add(name)
+        for name in names:
+            self.update(name)
+
+
+    def scan(self):
+
+        """
+            Updates the indicators whose file changed or went away since it
+            was last read.
+        """
+
+        try:
+            names = set(name for name in os.listdir(self.directory)
+                        if not name.startswith('.'))
+        except OSError as error:
+            self.logger.warn('Indicator channel cannot list %s: %s',
+                             self.directory, error)
+            return
+
+        for name in names | set(self.seen):
+            try:
+                status = os.stat(os.path.join(self.directory, name))
+                signature = (status.st_mtime, status.st_size)
+            except OSError:
+                signature = None
+            if signature is None or self.seen.get(name) != signature:
+                self.update(name)
+
+
+    def update(self, name):
+
+        """
+            Posts the state of the file to the indicator of the page, or
+            resets the indicator if the file is gone.
+        """
+
+        address = os.path.join(self.directory, name)
+        try:
+            status = os.stat(address)
+            indicator_file = open(address, 'r')
+            try:
+                content = indicator_file.read(MAX_SIZE)
+            finally:
+                indicator_file.close()
+        except (IOError, OSError):
+            self.seen.pop(name, None)
+            state = reset_state
+        else:
+            self.seen[name] = (status.st_mtime, status.st_size)
+            state = parse(content)
+            if state is None:
+                self.logger.warn('Indicator file %s could not be read.',
+                                 address)
+                return
+
+        page_name = name.decode('utf-8', 'replace')
+        for descriptor in self.application.dashboard.stack.descriptors:
+            if descriptor.name == page_name:
+                descriptor.indicator.post(**state)
+                return
+        self.logger.debug('Indicator file %s names no page.', address)
+
+
+    def close(self):
+        if self.inotify is not None:
+            self.notifier.setEnabled(False)
+            self.inotify.close()
+            self.inotify = None
+
+
+
+def parse(content):
+
+    """
+        Returns the complete indicator state of the content of a file, None if
+        it is not valid: a json object, a count or a text.
+    """
+
+    state = dict(reset_state)
+    content = content.strip()
+    if content.startswith('{'):
+        try:
+            values = json.loads(content)
+        except ValueError:
+            return None
+        if not isinstance(values, dict):
+            return None
+        if isinstance(values.get('count'), (int, long)) and \
+           not isinstance(values.get('count'), bool):
+            state['count'] = values['count']
+        if isinstance(values.get('urgency'), basestring):
+            state['urgency'] = values['urgency']
+        if isinstance(values.get('text'), basestring):
+            state['text'] = values['text']
+        return state
+
+    try:
+        state['count'] = int(content)
+    except ValueError:
+        if content:
+            state['text'] = content.decode('utf-8', 'replace').splitlines()[0]
+    return state
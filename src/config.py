@@ -0,0 +1,348 @@
+#!/usr/bin/env python
+
+"""
+    Typed configuration of Qontrol.
+    The configuration file is validated once against a schema, completed with
+    defaults for missing keys and turned into slotted objects, so that widgets
+    read plain attributes, eg. configuration.panel.thickness.
+"""
+
+import re
+import copy
+import json
+
+__version__ = "11.09.06.14.38"
+
+
+# default configuration, also written as a new user configuration file
+defaults = {
+            'style' : 'default',
+            'language' : 'english',
+            'orientation' : 'south',
+            'log' : {'level' : 'info',
+                     'format' : 'text',
+                     'ring-size' : 500,
+                     'max-size' : 1048576,
+                     'max-files' : 50,
+                     'max-bytes' : 20971520,
+                     'max-age' : 30},
+            'dashboard' : {'ratio' : 0.8,
+                           'current-page' : 0,
+                           'prewarm' : False,
+                           'memory-budget' : 67108864,
+                           'animation-mode' : 'snapshot',
+                           'pages' : ['Page 01',
+                                      'Page 02',
+                                      'Page 03',
+                                      'Page 04',
+                                      {'name' : 'Log',
+                                       'module' : 'pages',
+                                       'class' : 'LogPage'}]},
+            'animation' : {'mode' : 'normal',
+                           'duration' : 200,
+                           'easing' : 'out-cubic',
+                           'fps' : 60},
+            'providers' : {'threads' : 2,
+                           'processes' : 2},
+            'panel' : {'margin-vertical' : 2,
+                       'margin-horizontal' : 2,
+                       'button-spacing' : 2,
+                       'button-alignment' : 'center',
+                       'thickness' : 25}
+            }
+
+
+
+################################################################################
+###                              VALUE CHECKS                                ###
+################################################################################
+
+# Each check returns the value, converted if needed, or raises ValueError.
+
+def text(value):
+    if not isinstance(value, basestring):
+        raise ValueError('expected a string')
+    return value
+
+
+def choice(*options):
+    def check(value):
+        if value not in options:
+            raise ValueError('expected one of '+', '.join(options))
+        return str(value)
+    return check
+
+
+def integer(minimum=None):
+    def check(value):
+        if isinstance(value, bool) or not isinstance(value, (int, long, float)) \
+           or value != int(value):
+            raise ValueError('expected an integer')
+        if minimum is not None and value < minimum:
+            raise ValueError('expected at least %d' % minimum)
+        return int(value)
+    return check
+
+
+def number(minimum, maximum):
+    def check(value):
+        if isinstance(value, bool) or not isinstance(value, (int, long, float)):
+            raise ValueError('expected a number')
+        if not minimum < value <= maximum:
+            raise ValueError('expected a number above %s up to %s' % (minimum,
+                                                                      maximum))
+        return float(value)
+    return check
+
+
+def boolean(value):
+    if not isinstance(value, bool):
+        raise ValueError('expected true or false')
+    return value
+
+
+module_pattern = re.compile(r'^[A-Za-z_]\w*$')
+
+def page_entries(value):
+
+    # a page is a name, or an object naming the module and class of its plugin
+    if not isinstance(value, list):
+        raise ValueError('expected a list of pages')
+    entries = []
+    for entry in value:
+        if isinstance(entry, basestring):
+            entries.append(entry)
+            continue
+        if not isinstance(entry, dict) or \
+           sorted(entry) != ['class', 'module', 'name'] or \
+           not all(isinstance(item, basestring) for item in entry.values()):
+            raise ValueError('expected names or objects with a name, module '
+                             'and class')
+        if not module_pattern.match(entry['module']) or \
+           not module_pattern.match(entry['class']):
+            raise ValueError('expected a plain module and class name in %r' %
+                             entry)
+        entries.append({'name' : entry['name'],
+                        'module' : str(entry['module']),
+                        'class' : str(entry['class'])})
+    return entries
+
+
+orientations = ('south', 'north', 'west', 'east')
+
+easings = ('linear', 'in-quad', 'out-quad', 'in-out-quad', 'in-cubic',
+           'out-cubic', 'in-out-cubic', 'out-expo', 'in-out-sine')
+
+schema = {
+          'style' : text,
+          'language' : text,
+          'orientation' : choice(*orientations),
+          'log' : {'level' : choice('debug', 'info', 'warning', 'error'),
+                   'format' : choice('text', 'json'),
+                   'ring-size' : integer(1),
+                   'max-size' : integer(0),
+                   'max-files' : integer(0),
+                   'max-bytes' : integer(0),
+                   'max-age' : integer(0)},
+          'dashboard' : {'ratio' : number(0, 1),
+                         'current-page' : integer(0),
+                         'prewarm' : boolean,
+                         'memory-budget' : integer(0),
+                         'animation-mode' : choice('snapshot', 'live'),
+                         'pages' : page_entries},
+          'animation' : {'mode' : choice('normal', 'reduced', 'instant'),
+                         'duration' : integer(0),
+                         'easing' : choice(*easings),
+                         'fps' : integer(1)},
+          'providers' : {'threads' : integer(1),
+                         'processes' : integer(1)},
+          'panel' : {'margin-vertical' : integer(0),
+                     'margin-horizontal' : integer(0),
+                     'button-spacing' : integer(0),
+                     'button-alignment' : choice('left', 'right', 'top',
+                                                 'bottom', 'center'),
+                     'thickness' : integer(1)}
+          }
+
+
+
+################################################################################
+###                          CONFIGURATION OBJECTS                           ###
+################################################################################
+
+def attribute(key):
+    return key.replace('-', '_')
+
+
+class Section(object):
+
+    """
+        Slotted configuration section, one attribute per key of the file with
+        hyphens turned to underscores.
+    """
+
+    __slots__ = ()
+
+    def __init__(self, values):
+        for key, value in values.iteritems():
+            setattr(self, attribute(key), value)
+
+    def as_dict(self):
+
+        """
+            Returns the section as in the configuration file.
+        """
+
+        values = {}
+        for name in self.__slots__:
+            value = getattr(self, name)
+            if isinstance(value, Section):
+                value = value.as_dict()
+            values[name.replace('_', '-')] = value
+        return values
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.as_dict() == other.as_dict()
+
+    def __ne__(self, other):
+        return not self == other
+
+
+class LogConfiguration(Section):
+    __slots__ = ('level', 'format', 'ring_size', 'max_size', 'max_files',
+                 'max_bytes', 'max_age')
+
+
+class DashboardConfiguration(Section):
+    __slots__ = ('ratio', 'current_page', 'prewarm', 'memory_budget',
+                 'animation_mode', 'pages')
+
+
+class AnimationConfiguration(Section):
+    __slots__ = ('mode', 'duration', 'easing', 'fps')
+
+
+class ProvidersConfiguration(Section):
+    __slots__ = ('threads', 'processes')
+
+
+class PanelConfiguration(Section):
+    __slots__ = ('margin_vertical', 'margin_horizontal', 'button_spacing',
+                 'button_alignment', 'thickness')
+
+
+class Configuration(Section):
+
+    """
+        Whole configuration, with log, dashboard, animation, providers and
+        panel sections.
+    """
+
+    __slots__ = ('style', 'language', 'orientation', 'log', 'dashboard',
+                 'animation', 'providers', 'panel')
+
+    sections = {'log' : LogConfiguration,
+                'dashboard' : DashboardConfiguration,
+                'animation' : AnimationConfiguration,
+                'providers' : ProvidersConfiguration,
+                'panel' : PanelConfiguration}
+
+    def __init__(self, values):
+        values = dict(values)
+        for key, section in self.sections.iteritems():
+            values[key] = section(values[key])
+        Section.__init__(self, values)
+
+    def changed(self, other):
+
+        """
+            Returns the keys of the top-level entries differing from other.
+        """
+
+        return set(name for name in self.__slots__
+                   if getattr(self, name) != getattr(other, name))
+
+
+
+################################################################################
+###                              VALIDATION                                  ###
+################################################################################
+
+def validate(raw, current=None):
+
+    """
+        Checks the raw configuration read from file against the schema.
+        Missing keys get default values. Invalid values get the value of the
+        current configuration if given, default values otherwise.
+        Returns the Configuration and the list of errors found.
+    """
+
+    errors = []
+    fallback = current.as_dict() if current is not None else defaults
+
+    if not isinstance(raw, dict):
+        errors.append('the configuration is not an object, using defaults')
+        raw = {}
+
+    values = check_entries(raw, schema, defaults, fallback, '', errors)
+
+    # buttons are aligned along the bar only
+    alignment = values['panel']['button-alignment']
+    orientation = values['orientation']
+    if (alignment in ('left', 'right') and orientation in ('west', 'east')) or \
+       (alignment in ('top', 'bottom') and orientation in ('north', 'south')):
+        errors.append('panel.button-alignment: "%s" is not coherent with '
+                      'orientation "%s", using "center"' % (alignment,
+                                                            orientation))
+        values['panel']['button-alignment'] = 'center'
+
+    return Configuration(values), errors
+
+
+def read(address):
+
+    """
+        Returns the Configuration of the file at address, without reporting
+        errors, the defaults if it cannot be read. For what is set up before
+        there is a logger to report them.
+    """
+
+    try:
+        configuration_file = open(address, 'r')
+        try:
+            raw = json.loads(configuration_file.read())
+        finally:
+            configuration_file.close()
+    except (IOError, ValueError):
+        raw = {}
+    return validate(raw)[0]
+
+
+def check_entries(raw, schema, defaults, fallback, prefix, errors):
+    values = {}
+
+    for key in raw:
+        if key not in schema:
+            errors.append('%s%s: unknown key, ignored' % (prefix, key))
+
+    for key, check in schema.iteritems():
+        name = prefix+key
+        if key not in raw:
+            values[key] = copy.deepcopy(defaults[key])
+        elif isinstance(check, dict):
+            if isinstance(raw[key], dict):
+                values[key] = check_entries(raw[key], check, defaults[key],
+                                            fallback[key], name+'.', errors)
+            else:
+                errors.append('%s: expected an object, got %r' % (name,
+                                                                  raw[key]))
+                values[key] = copy.deepcopy(fallback[key])
+        else:
+            try:
+                values[key] = check(raw[key])
+            except ValueError as error:
+                errors.append('%s: %s, got %r' % (name, error, raw[key]))
+                values[key] = copy.deepcopy(fallback[key])
+
+    return values
+
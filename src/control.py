@@ -0,0 +1,274 @@
+#!/usr/bin/env python
+
+"""
+    Control interface of a running Qontrol, on the local socket
+    ~/.qontrol/ctl.sock served from the Qt event loop.
+
+    Each request is one line, either a command with its arguments:
+        show | hide | toggle
+        page INDEX|NAME
+        indicator NAME [count=N] [urgency=U] [text=T]
+        theme NAME
+        ping
+        launch [ARGUMENT...]     (sent by a second qontrol.py)
+    or a json object, eg. {"command" : "page", "page" : 2}. Arguments with
+    spaces are quoted as in a shell. Line requests get "ok" or "error: ..."
+    as answer, json requests {"ok" : true} or {"ok" : false, "error" : ...}.
+    qontrolctl.py is the command-line client.
+"""
+
+import json
+import shlex
+import socket
+import inspect
+import traceback
+
+from PyQt4 import QtCore, QtNetwork
+
+import qontrolctl
+
+__version__ = "11.09.06.14.38"
+
+
+
+class ControlError(Exception):
+    pass
+
+
+class ControlServer(QtCore.QObject):
+
+    """
+        Serves control requests on a local socket. Raises ControlError if
+        another Qontrol answers on it.
+    """
+
+    def __init__(self, parent, address, logger):
+        QtCore.QObject.__init__(self, parent)
+        self.application = parent
+        self.address = address
+        self.logger = logger
+
+        self.server = QtNetwork.QLocalServer(self)
+        if not self.server.listen(address):
+            # a Qontrol started at the same time as this one
+            try:
+                qontrolctl.send('ping', 0.5)
+            except socket.error:
+                pass
+            else:
+                raise ControlError('another Qontrol listens on %s' % address)
+            # a socket left behind by a Qontrol that did not quit cleanly
+            QtNetwork.QLocalServer.removeServer(address)
+            if not self.server.listen(address):
+                self.logger.error('Control socket %s could not be opened: %s',
+                                  address, self.server.errorString())
+                return
+        self.connect(self.server, QtCore.SIGNAL('newConnection()'),
+                     self.accept)
+        self.logger.info('Control socket listening on %s.', address)
+
+        self.commands = {'show' : self.show,
+                         'hide' : self.hide,
+                         'toggle' : self.toggle,
+                         'page' : self.page,
+                         'indicator' : self.indicator,
+                         'theme' : self.theme,
+                         'launch' : self.launch,
+                         'ping' : lambda: None}
+
+
+    def accept(self):
+        while self.server.hasPendingConnections():
+            connection = self.server.nextPendingConnection()
+            self.connect(connection, QtCore.SIGNAL('readyRead()'),
+                         lambda connection=connection: self.read(connection))
+            self.connect(connection, QtCore.SIGNAL('disconnected()'),
+                         connection.deleteLater)
+            # a request may have come with the connection
+            self.read(connection)
+
+
+    def read(self, connection):
+
+        """
+            Answers every complete request line received on the connection.
+        """
+
+        while connection.canReadLine():
+            line = str(connection.readLine()).strip()
+            if line:
+                connection.write(self.answer(line)+'\n')
+        connection.flush()
+
+
+    def answer(self, line):
+
+        """
+            Runs the request line and returns the answer line.
+        """
+
+        is_json = line.startswith('{')
+        try:
+            if is_json:
+                try:
+                    request = json.loads(line)
+                except ValueError as error:
+                    raise ControlError('invalid json: %s' % error)
+                if not isinstance(request, dict):
+                    raise ControlError('expected a json object')
+                request = dict((str(key), value)
+                               for key, value in request.iteritems())
+                name = request.pop('command', None)
+                arguments, options = [], request
+            else:
+                try:
+                    words = [word.decode('utf-8', 'replace')
+                             for word in shlex.split(line)]
+                except ValueError as error:
+                    raise ControlError(str(error))
+                name = words[0]
+                arguments = [word for word in words[1:] if '=' not in word]
+                options = dict((str(key), value) for key, value
+                               in (word.split('=', 1) for word in words[1:]
+                                   if '=' in word))
+
+            if name not in self.commands:
+                raise ControlError('unknown command %r' % name)
+            self.logger.debug('Control command: %s', line)
+            self.run(name, arguments, options)
+        except ControlError as error:
+            self.logger.warn('Control request %r failed: %s', line, error)
+            if is_json:
+                return json.dumps({'ok' : False, 'error' : str(error)})
+            return 'error: %s' % error
+
+        if is_json:
+            return json.dumps({'ok' : True})
+        return 'ok'
+
+
+    def run(self, name, arguments, options):
+
+        """
+            Runs the command with the arguments, once they are checked.
+            Errors of the command are logged and raised as ControlError.
+        """
+
+        command = self.commands[name]
+        check_arguments(name, command, arguments, options)
+        try:
+            command(*arguments, **options)
+        except ControlError:
+            raise
+        except Exception as error:
+            self.logger.error('Control command %s failed: %s', name,
+                              traceback.format_exc())
+            raise ControlError('%s failed: %s' % (name, error))
+
+
+    def close(self):
+        self.server.close()
+
+
+
+    ############################################################################
+    ###                             COMMANDS                                 ###
+    ############################################################################
+
+    def show(self):
+        self.application.dashboard.show_dashboard()
+
+
+    def hide(self):
+        self.application.dashboard.hide_dashboard()
+
+
+    def toggle(self):
+        self.application.dashboard.check_position()
+
+
+    def page(self, page):
+
+        """
+            Switches to the page, by index or name, and shows the dashboard.
+        """
+
+        dashboard = self.application.dashboard
+        index = find_page(dashboard.stack.descriptors, page)
+        dashboard.show_page(index)
+        self.application.update_config('dashboard', 'current-page', index)
+
+
+    def indicator(self, page, count=None, urgency=None, text=None):
+        stack = self.application.dashboard.stack
+        descriptor = stack.descriptors[find_page(stack.descriptors, page)]
+        if count is not None:
+            try:
+                count = int(count)
+            except ValueError:
+                raise ControlError('count should be a number')
+        descriptor.indicator.post(count, urgency, text)
+
+
+    def theme(self, name):
+        if name not in self.application.theme_manager.themes():
+            raise ControlError('no theme %r' % name)
+        self.application.set_theme(name)
+
+
+    def launch(self, *arguments, **options):
+
+        """
+            Second launch of qontrol.py, forwarded to this Qontrol. Arguments
+            naming a command run it, eg. qontrol.py toggle, others are
+            startup options, too late to apply.
+        """
+
+        self.logger.info('A second launch was forwarded here, arguments: %s',
+                         ' '.join(arguments))
+        if arguments and arguments[0] in self.commands and \
+           arguments[0] != 'launch':
+            self.run(arguments[0], arguments[1:], options)
+
+
+
+def check_arguments(name, command, arguments, options):
+
+    """
+        Raises ControlError unless the command takes the positional arguments
+        and the options given.
+    """
+
+    spec = inspect.getargspec(command)
+    names = spec.args[1:] if inspect.ismethod(command) else spec.args
+    required = names[:len(names) - len(spec.defaults or ())]
+
+    if len(arguments) > len(names) and spec.varargs is None:
+        raise ControlError('%s takes at most %d arguments, got %d' % (
+                                            name, len(names), len(arguments)))
+    for key in options:
+        if key in names[:len(arguments)]:
+            raise ControlError('%s got %s twice' % (name, key))
+        if key not in names and spec.keywords is None:
+            raise ControlError('%s has no option %s' % (name, key))
+    missing = [key for key in required[len(arguments):] if key not in options]
+    if missing:
+        raise ControlError('%s misses %s' % (name, ', '.join(missing)))
+
+
+def find_page(descriptors, page):
+
+    """
+        Returns the index of the page given by index or name.
+    """
+
+    if isinstance(page, basestring) and page.isdigit():
+        page = int(page)
+    if isinstance(page, (int, long)) and not isinstance(page, bool):
+        if 0 <= page < len(descriptors):
+            return page
+        raise ControlError('no page %d, there are %d' % (page, len(descriptors)))
+    for index, descriptor in enumerate(descriptors):
+        if descriptor.name == page:
+            return index
+    raise ControlError('no page %r' % page)
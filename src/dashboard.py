@@ -4,10 +4,16 @@
 from PyQt4 import QtGui, QtCore
 
 import stack
+import animation
 
 __version__ = "11.09.06.14.38"
 
 
+# visibility states of the dashboard
+HIDDEN, SHOWING, SHOWN, HIDING = range(4)
+states = ('hidden', 'showing', 'shown', 'hiding')
+
+
 ################################################################################
 ###                         DASHBOARD META CLASS                             ###
 ################################################################################
@@ -17,6 +23,11 @@ class Dashboard(QtGui.QFrame):
     """
        Class for the dashboard window holding a frame with stacked layout.
        The dashboard shows/hides on call from the panel bar button-indicators.
+       In snapshot animation mode, a pixmap of the stack slides in place of
+       the live widgets, which are swapped back in at the end.
+       Its state is one of HIDDEN, SHOWING, SHOWN and HIDING. One animation
+       controller is reused for every slide; showing while hiding, or the
+       reverse, turns the slide around from where it is.
     """
     
     def __init__(self, orientation):
@@ -37,18 +48,19 @@ class Dashboard(QtGui.QFrame):
         self.screen_height = int(QtGui.QDesktopWidget().screenGeometry().height())
 
         # Set size according to configuration
-        self.setFixedWidth(self.screen_width * 
-                           self.application.configuration['dashboard']['ratio'])
-        self.setFixedHeight(self.screen_height *
-                            self.application.configuration['dashboard']['ratio'])
-
-        self.logger.info('Dashboard size fixed at '+\
-                         str(self.maximumWidth())+'*'+\
-                         str(self.maximumHeight()))
+        self.set_size()
 
         # Set position
         self.define_positions()
         self.move(self.hide_position)
+        self.state = HIDDEN
+
+        # Animation sliding the dashboard in and out
+        self.animation = animation.AnimationController(self,
+                                        self.application.configuration.animation,
+                                        self.logger)
+        self.connect(self.animation, QtCore.SIGNAL('finished()'),
+                     self.slide_finished)
 
         # Set appearance
         self.setAttribute(QtCore.Qt.WA_TranslucentBackground, True)
@@ -68,22 +80,83 @@ class Dashboard(QtGui.QFrame):
         self.layout.setContentsMargins(0, 0, 0, 0)
         self.layout.addWidget(self.stack)
         self.setLayout(self.layout)
+
+        # Snapshot of the stack shown while sliding, outside of the layout
+        self.snapshot_label = QtGui.QLabel(self)
+        self.snapshot_label.hide()
     
 
+    def set_size(self):
+
+        """
+            Fixes the size of the dashboard according to the ratio in
+            configuration.
+        """
+
+        ratio = self.application.configuration.dashboard.ratio
+        self.setFixedWidth(int(self.screen_width * ratio))
+        self.setFixedHeight(int(self.screen_height * ratio))
+
+        self.logger.info('Dashboard size fixed at %d*%d',
+                         self.maximumWidth(), self.maximumHeight())
+
+
+    def apply_configuration(self):
+
+        """
+            Resizes and repositions the dashboard after a change of ratio or
+            panel thickness in configuration, keeping it shown or hidden.
+        """
+
+        shown = self.state in (SHOWN, SHOWING)
+        self.stop_slide(shown)
+        self.set_size()
+        self.stack.set_size()
+        self.stack.clear_snapshots()
+        self.define_positions()
+        self.move(self.show_position if shown else self.hide_position)
+
+
+    def set_orientation(self, orientation):
+
+        """
+            Replaces the stack with one of the new orientation, moving the
+            pages over so they keep their state. The dashboard is hidden.
+        """
+
+        self.orientation = orientation
+        self.stop_slide(False)
+        self.define_positions()
+        self.move(self.hide_position)
+
+        old_stack = self.stack
+        current_index = old_stack.layout.currentIndex()
+        self.stack = self.stack_orientation_options[self.orientation](self,
+                                                        old_stack.take_pages())
+        self.stack.layout.setCurrentIndex(current_index)
+        self.layout.removeWidget(old_stack)
+        old_stack.deleteLater()
+        self.layout.addWidget(self.stack)
+        # snapshots show the style of the former orientation
+        self.stack.clear_snapshots()
+        self.logger.info('Dashboard orientation changed to %s', orientation)
+
+
     def define_positions(self):
 
         """
             Defines show and hide position according to orientation.
         """
         
+        thickness = self.application.configuration.panel.thickness
+
         # Define show_position on X axis
         if self.orientation in ('north', 'south'):
             pos_x = (self.screen_width - self.maximumWidth())/2
         elif self.orientation in ('west'):
-            pos_x = self.application.configuration['panel']['thickness']
+            pos_x = thickness
         elif self.orientation in ('east'):
-            pos_x = self.screen_width - self.maximumWidth() - \
-                    self.application.configuration['panel']['thickness']
+            pos_x = self.screen_width - self.maximumWidth() - thickness
         else:
             # This shouldn't happen, but we never know
             self.logger.error("I need a proper layout :( ")
@@ -93,19 +166,17 @@ class Dashboard(QtGui.QFrame):
         if self.orientation in ('west', 'east'):
             pos_y = (self.screen_height - self.maximumHeight())/2
         elif self.orientation in ('north'):
-            pos_y = self.application.configuration['panel']['thickness']
+            pos_y = thickness
         elif self.orientation in ('south'):
-            pos_y = self.screen_height - self.maximumHeight() - \
-                    self.application.configuration['panel']['thickness']
+            pos_y = self.screen_height - self.maximumHeight() - thickness
         else:
             # This shouldn't happen, but we never know
             self.logger.error("I need a proper layout :( ")
             QtCore.QCoreApplication.quit()
 
         self.show_position = QtCore.QPoint(pos_x, pos_y)
-        self.logger.info('Dashboard show position set to '+\
-                        str(self.show_position.x())+', '+\
-                        str(self.show_position.y()))
+        self.logger.info('Dashboard show position set to %d, %d',
+                        self.show_position.x(), self.show_position.y())
 
         # Define hide_position on X axis
         if self.orientation in ('west'):
@@ -126,24 +197,36 @@ class Dashboard(QtGui.QFrame):
             pass
 
         self.hide_position = QtCore.QPoint(pos_x, pos_y)
-        self.logger.info('Dashboard hide position set to '+\
-                        str(self.hide_position.x())+', '+\
-                        str(self.hide_position.y()))
+        self.logger.info('Dashboard hide position set to %d, %d',
+                        self.hide_position.x(), self.hide_position.y())
 
 
     def check_position(self):
 
         """
-            Calls for animation after checking current position.        
+            Hides the dashboard if it is shown or showing, shows it otherwise.
+            A slide in progress is reversed from where it is.
         """
 
-        if self.pos() == self.show_position:
+        if self.state in (SHOWN, SHOWING):
             self.hide_dashboard()
-
-        if self.pos() == self.hide_position:
+        else:
             self.show_dashboard()
 
 
+    def show_page(self, index):
+
+        """
+            Switches to the page at index and shows the dashboard.
+        """
+
+        if index != self.stack.layout.currentIndex():
+            self.stack.set_current_index(index)
+            # a snapshot sliding in shows the former page
+            if self.snapshot_label.isVisible():
+                self.snapshot_label.setPixmap(self.stack.snapshot())
+        self.show_dashboard()
+
 
     def show_dashboard(self):
         
@@ -151,11 +234,12 @@ class Dashboard(QtGui.QFrame):
             Triggers animation that will show the entire dashboard.
         """
 
-        self.show_animation = QtCore.QPropertyAnimation(self, "pos")
-        self.show_animation.setDuration(200)
-        self.show_animation.setStartValue(self.hide_position)
-        self.show_animation.setEndValue(self.show_position)
-        self.show_animation.start()
+        if self.state in (SHOWN, SHOWING):
+            return
+
+        # the current page is built and resumed before it slides in
+        self.stack.set_dashboard_shown(True)
+        self.slide(SHOWING, self.show_position)
 
 
 
@@ -165,11 +249,75 @@ class Dashboard(QtGui.QFrame):
             Triggers animation that will hide the entire dashboard.
         """
 
-        self.hide_animation = QtCore.QPropertyAnimation(self, "pos")
-        self.hide_animation.setDuration(200)
-        self.hide_animation.setStartValue(self.show_position)
-        self.hide_animation.setEndValue(self.hide_position)
-        self.hide_animation.start()    
+        if self.state in (HIDDEN, HIDING):
+            return
+
+        # the current page is suspended while it slides out
+        self.stack.set_dashboard_shown(False)
+        self.slide(HIDING, self.hide_position)
+
+
+    def slide(self, state, target):
+
+        """
+            Runs the animation from the current position to target. A slide
+            reversed half way takes half the time, at the same speed.
+        """
+
+        self.animation.stop()
+        distance = (self.show_position - self.hide_position).manhattanLength()
+        remaining = (target - self.pos()).manhattanLength()
+
+        self.logger.debug('Dashboard %s to %s.', states[self.state],
+                          states[state])
+        self.state = state
+        # an instant move has no frames to spare drawing
+        if not self.snapshot_label.isVisible() and \
+           not self.animation.is_instant():
+            self.start_snapshot()
+        self.animation.slide(target, remaining / float(max(distance, 1)))
+
+
+    def slide_finished(self):
+        self.state = SHOWN if self.state == SHOWING else HIDDEN
+        self.end_snapshot()
+
+
+    def stop_slide(self, shown):
+
+        """
+            Stops any slide and sets the state without animation, the
+            position is left to the caller.
+        """
+
+        self.animation.stop()
+        self.end_snapshot()
+        self.state = SHOWN if shown else HIDDEN
+
+
+    def start_snapshot(self):
+
+        """
+            Swaps the stack for its snapshot until the slide finishes, in
+            snapshot animation mode, so that frames only move a pixmap.
+        """
+
+        if self.application.configuration.dashboard.animation_mode != 'snapshot':
+            return
+
+        self.snapshot_label.setPixmap(self.stack.snapshot())
+        self.snapshot_label.setGeometry(self.stack.geometry())
+        self.snapshot_label.show()
+        self.snapshot_label.raise_()
+        self.stack.hide()
+
+
+    def end_snapshot(self):
+        if not self.snapshot_label.isVisible():
+            return
+        self.stack.show()
+        self.snapshot_label.hide()
+        self.snapshot_label.clear()
 
 ################################################################################
 ###                   DASHBOARD ORIENTATED CLASES                            ###
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+
+"""
+    Indicator update pipeline of Qontrol.
+
+    Pages, and outside sources, change the state of indicators by posting to
+    them, eg. page.indicator.post(count=12, urgency='high'). Posts only merge
+    into the pending state of their indicator; pending states are applied
+    together at most once per frame, with the Bar repainted once. A flood of
+    events thus costs the panel one repaint per frame at most.
+    Posts are made from the GUI thread.
+"""
+
+import time
+
+from PyQt4 import QtCore
+
+__version__ = "11.09.06.14.38"
+
+
+# urgencies an indicator can show, from least to most urgent
+urgencies = ('none', 'low', 'normal', 'high')
+
+
+
+class IndicatorPipeline(QtCore.QObject):
+
+    """
+        Coalesces the posted states of indicators and applies them on frame
+        ticks of frame_interval ms. How many posts were coalesced into each
+        state applied is logged every report_interval seconds.
+    """
+
+    def __init__(self, parent, logger, frame_interval=16, report_interval=60):
+        QtCore.QObject.__init__(self, parent)
+        self.application = parent
+        self.logger = logger
+        self.frame_interval = frame_interval / 1000.0
+        # indicator: [count, urgency, text] to apply on next frame
+        self.pending = {}
+        self.last_flush = 0
+        # posts received and states applied since the last report
+        self.posted = 0
+        self.applied = 0
+        self.report_interval = report_interval
+        self.reported = time.time()
+
+        self.timer = QtCore.QTimer(self)
+        self.timer.setSingleShot(True)
+        self.connect(self.timer, QtCore.SIGNAL('timeout()'), self.flush)
+
+
+    def post(self, indicator, count=None, urgency=None, text=None):
+
+        """
+            Merges the state into the pending state of the indicator and
+            makes sure a frame is coming.
+        """
+
+        if urgency is not None and urgency not in urgencies:
+            self.logger.warn('Unknown urgency %r posted to %s, expected one '
+                             'of %s.', urgency, indicator.name,
+                             ', '.join(urgencies))
+            urgency = None
+
+        self.posted += 1
+        state = self.pending.get(indicator)
+        if state is None:
+            self.pending[indicator] = [count, urgency, text]
+        else:
+            for position, value in enumerate((count, urgency, text)):
+                if value is not None:
+                    state[position] = value
+
+        if not self.timer.isActive():
+            wait = self.last_flush + self.frame_interval - time.time()
+            self.timer.start(max(int(wait * 1000), 0))
+
+
+    def flush(self):
+
+        """
+            Applies the pending states, repainting the Bar once.
+        """
+
+        self.last_flush = time.time()
+        pending = self.pending
+        self.pending = {}
+        if not pending:
+            return
+
+        bar = self.application.panel.bar
+        bar.setUpdatesEnabled(False)
+        try:
+            for indicator, state in pending.iteritems():
+                try:
+                    indicator.apply_state(*state)
+                except RuntimeError:
+                    # indicator deleted since the post
+                    continue
+                self.applied += 1
+        finally:
+            bar.setUpdatesEnabled(True)
+
+        if self.last_flush - self.reported >= self.report_interval:
+            self.logger.info('Indicator pipeline: %d posts applied as %d '
+                             'states, %.1f posts per state.', self.posted,
+                             self.applied,
+                             self.posted / float(max(self.applied, 1)))
+            self.posted = 0
+            self.applied = 0
+            self.reported = self.last_flush
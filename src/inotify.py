@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+
+"""
+    Minimal ctypes binding of Linux inotify, for watching a directory from
+    the Qt event loop: the descriptor is non-blocking and read when a
+    QSocketNotifier reports it readable.
+"""
+
+import os
+import sys
+import errno
+import struct
+import ctypes
+import ctypes.util
+
+__version__ = "11.09.06.14.38"
+
+
+# event masks, from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+
+# flags of inotify_init1
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0x00080000
+
+# struct inotify_event without its name
+event_header = struct.Struct('iIII')
+
+libc = None
+if sys.platform.startswith('linux'):
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6',
+                           use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+    except (OSError, AttributeError):
+        libc = None
+
+
+def available():
+    return libc is not None
+
+
+class Inotify(object):
+
+    """
+        Non-blocking inotify instance. Raises OSError if inotify is not
+        available or the kernel refuses it.
+    """
+
+    def __init__(self):
+        if libc is None:
+            raise OSError(errno.ENOSYS, 'inotify is not available')
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+
+
+    def add_watch(self, path, mask):
+
+        """
+            Watches path for the events of mask. Returns the watch descriptor.
+        """
+
+        if isinstance(path, unicode):
+            path = path.encode(sys.getfilesystemencoding() or 'utf-8')
+        descriptor = libc.inotify_add_watch(self.fd, path, mask)
+        if descriptor < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error), path)
+        return descriptor
+
+
+    def read_events(self):
+
+        """
+            Returns the pending events as (watch descriptor, mask, cookie,
+            name) tuples, reading until the queue is empty.
+        """
+
+        events = []
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except OSError as error:
+                if error.errno in (errno.EAGAIN, errno.EINTR):
+                    break
+                raise
+            if not data:
+                break
+
+            offset = 0
+            while offset + event_header.size <= len(data):
+                descriptor, mask, cookie, length = event_header.unpack_from(data,
+                                                                           offset)
+                offset += event_header.size
+                name = data[offset:offset + length].rstrip('\0')
+                offset += length
+                events.append((descriptor, mask, cookie, name))
+        return events
+
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
@@ -1,38 +1,186 @@
 #!/usr/bin/env python
 
-from time import strftime, localtime
+from time import strftime, localtime, time
 from os import path
+import os
+import sys
+import gzip
+import shutil
 import inspect
+import threading
+import Queue
+import atexit
+import json
+import itertools
+import collections
+
+# numeric severity of each level, records below the logger level are dropped
+levels = {'debug' : 10,
+          'info' : 20,
+          'warning' : 30,
+          'error' : 40}
 
 class Logger(object):
     
     """
         Logger class to print input to log file and to console if verbose is on.
+        If queued is on, records are handed to a LogWriter thread instead of
+        being written to the file by the caller, which also rotates the file
+        once it outgrows the size set with set_rotation().
+        If stamp is off, records carry no @File/@Line call-site stamp.
+        If structured is on, each record is written as one JSON object per
+        line instead of the fixed-width text line, see set_format().
+        The last ring_size records are also kept in memory for viewers, see
+        records_since().
+        Messages may be format strings with their arguments passed after them,
+        they are only formatted if their level passes the logger level.
     """
     
-    def __init__(self, log_path, verbose=False):
+    def __init__(self, log_path, verbose=False, queued=True, stamp=True,
+                 structured=False, ring_size=500):
         self.verbose = verbose
-        self.message_types = {'info' : 92,
+        self.structured = structured
+        self.level = levels['info']
+        self.message_types = {'debug' : 94,
+                              'info' : 92,
                               'warning' : 33,
                               'error' : 91,
                               'log error': 95}
 
+        # ring buffer of (sequence, message type, text) of the last records
+        self.ring = collections.deque(maxlen=ring_size)
+        self.ring_lock = threading.Lock()
+        self.sequence = itertools.count(1)
+
+        # caller of log() is three frames up: lookup, log, info/warn/error
+        self.stamper = CallStamper(3) if stamp else None
+
         file_name = strftime('%y%m%d%H%M%S', localtime())+'.log'
-        self.file_name = path.expanduser(path.join(log_path, file_name))
+        self.log_path = path.expanduser(log_path)
+        self.file_name = path.join(self.log_path, file_name)
+        # identifies the records of this run among those of other sessions
+        self.session = '%s-%d' % (file_name[:-len('.log')], os.getpid())
+
+        # open the file once here so that a missing log path raises IOError
+        # in the caller, as it always did
+        log_file = open(self.file_name, 'a')
+
+        # start the background writer if required
+        self.writer = None
+        if queued:
+            self.writer = LogWriter(log_file, self.file_name)
+            self.writer.start()
+            # make sure pending records reach the disk on interpreter exit
+            atexit.register(self.close)
+        else:
+            log_file.close()
+
         self.info('Logger initiated.')
         object.__init__(self)
         
-    def info(self, message):
-        self.log(message, 'info')
+    def set_level(self, level):
+
+        """
+            Sets the minimum level ('debug', 'info', 'warning' or 'error')
+            of the records to keep.
+        """
+
+        try:
+            self.level = levels[level]
+        except KeyError:
+            self.warn('Unknown log level "%s", level is unchanged.', level)
+
+    def set_format(self, log_format):
+
+        """
+            Switches between 'text' and 'json' records. Records already
+            written keep their format.
+        """
+
+        if log_format in ('text', 'json'):
+            self.structured = log_format == 'json'
+        else:
+            self.warn('Unknown log format "%s", format is unchanged.',
+                      log_format)
+
+    def set_ring_size(self, ring_size):
+
+        """
+            Sets how many records are kept in memory, keeping the newest.
+        """
+
+        with self.ring_lock:
+            self.ring = collections.deque(self.ring, maxlen=ring_size)
 
-    def warn(self, message):
-        self.log(message, 'warning')
+    def records_since(self, sequence):
 
-    def error(self, message):
-        self.log(message, 'error')
+        """
+            Returns the (sequence, message type, text) records of the ring
+            buffer newer than sequence, oldest first.
+        """
+
+        records = []
+        with self.ring_lock:
+            for record in reversed(self.ring):
+                if record[0] <= sequence:
+                    break
+                records.append(record)
+        records.reverse()
+        return records
+
+    def set_rotation(self, max_size):
+
+        """
+            Sets the size in bytes past which the active file is rotated to a
+            compressed segment. Only applies to a queued logger.
+        """
+
+        if self.writer is not None:
+            self.writer.max_size = max_size
+
+    def clean_up(self, max_files, max_bytes, max_age):
+
+        """
+            Applies the retention policy to the log directory in the background:
+            files beyond max_files, past max_bytes in total or older than
+            max_age days are removed, finished ones are compressed.
+            The writer applies it again after each rotation.
+        """
+
+        if self.writer is not None:
+            self.writer.retention = (max_files, max_bytes, max_age)
+        cleaner = threading.Thread(target=self._clean_up, name='LogCleaner',
+                                   args=(max_files, max_bytes, max_age))
+        cleaner.daemon = True
+        cleaner.start()
+
+    def _clean_up(self, max_files, max_bytes, max_age):
+        with retention_lock:
+            removed, compressed = clean_logs(self.log_path, self.file_name,
+                                             max_files, max_bytes, max_age)
+        self.info('Log clean-up removed %d and compressed %d files.',
+                  removed, compressed)
+
+    def debug(self, message, *args):
+        if self.level > levels['debug']:
+            return
+        self.log(message, 'debug', args)
+
+    def info(self, message, *args):
+        if self.level > levels['info']:
+            return
+        self.log(message, 'info', args)
+
+    def warn(self, message, *args):
+        if self.level > levels['warning']:
+            return
+        self.log(message, 'warning', args)
+
+    def error(self, message, *args):
+        self.log(message, 'error', args)
    
 
-    def log(self, message, message_type):
+    def log(self, message, message_type, args=()):
         
         # list of items to print:
         elements = []
@@ -42,12 +190,10 @@ class Logger(object):
         elements.append(time_stamp)
 
         # make frame-stamp
-        current_frame = inspect.currentframe()
-        call_frame = inspect.getouterframes(current_frame, 1)
-        frame = call_frame[2]
-        call_file = frame[1].split('/')[-1].ljust(15)
-        call_line = str('%04d' % int(frame[2]))
-        frame_stamp = '@File: '+call_file+' @Line: '+call_line+': '
+        if self.stamper is not None:
+            frame_stamp, call_file, call_line = self.stamper.lookup()
+        else:
+            frame_stamp, call_file, call_line = '', None, None
         elements.append(frame_stamp)
 
         # fromat message type:
@@ -57,27 +203,370 @@ class Logger(object):
         if message == None:
             message = "LOG MESSAGE OMITTED!"
             message_type = 'log error'
+        # fill in arguments of the format string
+        elif args:
+            message = message % args
         # fromat message to string
         message = str(message)
         elements.append(message)
 
+        # keep the record for viewers
+        with self.ring_lock:
+            self.ring.append((self.sequence.next(), message_type,
+                              ' '.join(elements)))
+
         # compose string:
-        string = ' '.join(elements)+'\n'
+        if self.structured:
+            record = {'ts' : time(),
+                      'level' : message_type,
+                      'file' : call_file,
+                      'line' : call_line,
+                      'msg' : message.decode('utf-8', 'replace'),
+                      'session' : self.session}
+            string = json.dumps(record, separators=(',', ':'))+'\n'
+        else:
+            string = ' '.join(elements)+'\n'
         
-        # open file to write to:
-        try:
-            log_file = open(self.file_name, 'a')
-            log_file.write(string)
-            log_file.close()
-        except:
-            raise
+        # hand the line to the writer, or write it ourselves:
+        if self.writer is not None and self.writer.is_alive():
+            self.writer.put(string)
+        else:
+            try:
+                log_file = open(self.file_name, 'a')
+                log_file.write(string)
+                log_file.close()
+            except:
+                raise
         
         # print to screen if required
         if self.verbose == True:
             print elements[0]+' '+elements[1]+\
             ' \033[1m\033[%dm'%self.message_types[message_type]+\
             elements[2]+'\033[0m '+elements[3]
-        
+
+
+    def flush(self):
+
+        """
+            Blocks until every record queued so far has been written.
+        """
+
+        if self.writer is not None and self.writer.is_alive():
+            self.writer.flush()
+
+
+    def close(self):
+
+        """
+            Stops the writer thread after it has written all pending records.
+            Later records are written synchronously.
+        """
+
+        if self.writer is not None:
+            self.writer.stop()
+            self.writer = None
+
+
+
+################################################################################
+###                           CALL-SITE STAMPS                               ###
+################################################################################
+
+class CallStamper(object):
+
+    """
+        Makes the '@File: ... @Line: ...' stamp of the code calling the logger.
+        Only the one frame at the given depth is looked at, and the formatted
+        stamp is cached per code object and line number along with the bare
+        file name and line used by structured records.
+    """
+
+    def __init__(self, depth):
+        self.depth = depth
+        self.cache = {}
+
+
+    def lookup(self):
+
+        """
+            Returns the stamp, file name and line number for the frame depth
+            levels above this one.
+        """
+
+        frame = sys._getframe(self.depth)
+        key = (frame.f_code, frame.f_lineno)
+        try:
+            return self.cache[key]
+        except KeyError:
+            call_file = frame.f_code.co_filename.split('/')[-1]
+            call_line = str('%04d' % frame.f_lineno)
+            frame_stamp = '@File: '+call_file.ljust(15)+' @Line: '+call_line+': '
+            entry = (frame_stamp, call_file, frame.f_lineno)
+            self.cache[key] = entry
+            return entry
+
+
+
+################################################################################
+###                           BACKGROUND WRITER                              ###
+################################################################################
+
+class LogWriter(threading.Thread):
+
+    """
+        Daemon thread owning the log file handle.
+        Records pushed with put() are batched and written when the batch
+        reaches max_records or when max_delay seconds have passed since the
+        first record of the batch, whichever comes first.
+        Once the file grows past max_size bytes it is renamed to a numbered
+        segment, compressed in the background and a fresh file is opened.
+        The retention policy, (max_files, max_bytes, max_age) once set, is
+        applied after each segment is compressed.
+    """
+
+    def __init__(self, log_file, file_name, max_records=64, max_delay=0.5,
+                 max_size=None):
+        threading.Thread.__init__(self, name='LogWriter')
+        self.daemon = True
+
+        self.log_file = log_file
+        self.file_name = file_name
+        self.max_size = max_size
+        self.retention = None
+        self.segment = 0
+        self.max_records = max_records
+        self.max_delay = max_delay
+        self.queue = Queue.Queue()
+
+        # sentinel understood by the run loop
+        self._stop_request = object()
+
+
+    def put(self, string):
+
+        """
+            Pushes a formatted line on the queue. Never touches the disk.
+        """
+
+        self.queue.put(string)
+
+
+    def flush(self):
+
+        """
+            Asks the thread to write its batch now and waits until it has.
+        """
+
+        done = threading.Event()
+        self.queue.put(done)
+        done.wait()
+
+
+    def stop(self):
+
+        """
+            Writes what is pending, closes the file and ends the thread.
+        """
+
+        if self.is_alive():
+            self.queue.put(self._stop_request)
+            self.join()
+
+
+    def run(self):
+        batch = []
+        deadline = None
+
+        while True:
+            # wait for the next record, but not past the batch deadline
+            try:
+                if deadline is None:
+                    item = self.queue.get()
+                else:
+                    item = self.queue.get(True, max(deadline - time(), 0))
+            except Queue.Empty:
+                item = None
+
+            if isinstance(item, basestring):
+                if not batch:
+                    deadline = time() + self.max_delay
+                batch.append(item)
+                # drain whatever else is already waiting without blocking
+                while len(batch) < self.max_records:
+                    try:
+                        item = self.queue.get_nowait()
+                    except Queue.Empty:
+                        item = None
+                        break
+                    if not isinstance(item, basestring):
+                        break
+                    batch.append(item)
+                    item = None
+
+            # write the batch if a threshold was reached or it was requested
+            if batch and (item is not None or len(batch) >= self.max_records
+                          or time() >= deadline):
+                self.write(batch)
+                batch = []
+                deadline = None
+
+            if item is self._stop_request:
+                self.log_file.close()
+                return
+            elif isinstance(item, threading._Event):
+                item.set()
+
+
+    def write(self, batch):
+
+        """
+            Writes a batch of lines with a single call and flushes the handle.
+        """
+
+        try:
+            self.log_file.write(''.join(batch))
+            self.log_file.flush()
+            if self.max_size and self.log_file.tell() >= self.max_size:
+                self.rotate()
+        except Exception:
+            # there is nowhere left to report this, drop the batch
+            pass
+
+
+    def rotate(self):
+
+        """
+            Moves the active file to the next segment and reopens it.
+        """
+
+        self.log_file.close()
+        self.segment += 1
+        segment_name = '%s.%03d.log' % (self.file_name[:-len('.log')],
+                                        self.segment)
+        os.rename(self.file_name, segment_name)
+        self.log_file = open(self.file_name, 'a')
+
+        compressor = threading.Thread(target=self.finish_segment,
+                                      name='LogCompressor',
+                                      args=(segment_name,))
+        compressor.daemon = True
+        compressor.start()
+
+
+    def finish_segment(self, segment_name):
+
+        """
+            Compresses a rotated segment, then applies the retention policy so
+            that a long session does not pile up segments.
+        """
+
+        with retention_lock:
+            try:
+                compress_log(segment_name)
+            except (IOError, OSError):
+                # compressed by a clean-up meanwhile
+                pass
+            if self.retention is not None:
+                try:
+                    clean_logs(path.dirname(self.file_name), self.file_name,
+                               *self.retention)
+                except (IOError, OSError):
+                    pass
+
+
+
+################################################################################
+###                          ROTATION AND RETENTION                          ###
+################################################################################
+
+# held while compressing or cleaning, by the writer and the start-up clean-up
+retention_lock = threading.Lock()
+
+
+def compress_log(file_name):
+
+    """
+        Gzips a finished log file next to itself and removes the original.
+        The archive is written under a temporary name first so that an
+        interrupted run never leaves a truncated .gz behind.
+    """
+
+    temporary_name = file_name+'.gz.tmp'
+    status = os.stat(file_name)
+    source = open(file_name, 'rb')
+    try:
+        archive = gzip.open(temporary_name, 'wb')
+        try:
+            shutil.copyfileobj(source, archive)
+        finally:
+            archive.close()
+    finally:
+        source.close()
+    # keep the original date for the retention policy
+    os.utime(temporary_name, (status.st_atime, status.st_mtime))
+    os.rename(temporary_name, file_name+'.gz')
+    os.remove(file_name)
+    return file_name+'.gz'
+
+
+def clean_logs(log_path, active_file, max_files, max_bytes, max_age):
+
+    """
+        Keeps the newest log files in log_path within max_files, max_bytes and
+        max_age (days), removes the rest and compresses the plain ones kept.
+        Only the active file is left alone, finished segments of the session
+        count like any other log. Returns the number of removed and compressed
+        files.
+    """
+
+    removed = 0
+    compressed = 0
+    oldest = time() - max_age * 86400
+
+    # list finished logs, newest first
+    active_name = path.basename(active_file)
+    entries = []
+    for name in os.listdir(log_path):
+        file_name = path.join(log_path, name)
+        if name == active_name:
+            continue
+        try:
+            if name.endswith('.gz.tmp'):
+                # left over from an interrupted compression
+                os.remove(file_name)
+            elif name.endswith('.log') or name.endswith('.log.gz'):
+                status = os.stat(file_name)
+                entries.append((status.st_mtime, status.st_size, file_name))
+        except OSError:
+            # removed by someone else meanwhile
+            pass
+    entries.sort(reverse=True)
+
+    kept_files = 0
+    kept_bytes = 0
+    for modified, size, file_name in entries:
+        try:
+            if kept_files >= max_files or modified < oldest:
+                os.remove(file_name)
+                removed += 1
+                continue
+            # count kept files at their compressed size
+            if file_name.endswith('.log'):
+                file_name = compress_log(file_name)
+                size = os.path.getsize(file_name)
+                compressed += 1
+            if kept_bytes + size > max_bytes:
+                os.remove(file_name)
+                removed += 1
+                continue
+            kept_files += 1
+            kept_bytes += size
+        except (IOError, OSError):
+            pass
+
+    return removed, compressed
+
+
 
 def test_logger():
     print "A test is run for logger:"
@@ -86,10 +575,59 @@ def test_logger():
     logger.warn('test warning')
     logger.error('test error')
     logger.info('')
+    logger.info('test %s with %d arguments', 'format', 2)
+    logger.set_level('warning')
+    logger.info('test filtered info %s', 'NOT SHOWN')
+    logger.close()
     
 
+def benchmark_logger(count=20000):
+
+    """
+        Prints messages per second logged with the former inspect-based
+        call-site lookup, with the CallStamper, without stamps and below the
+        logger level.
+    """
+
+    import tempfile
+    import shutil
+
+    class InspectStamper(object):
+        def lookup(self):
+            # call-site lookup as Logger.log used to do it
+            current_frame = inspect.currentframe()
+            call_frame = inspect.getouterframes(current_frame, 1)
+            frame = call_frame[3]
+            call_file = frame[1].split('/')[-1]
+            call_line = str('%04d' % int(frame[2]))
+            frame_stamp = '@File: '+call_file.ljust(15)+' @Line: '+call_line+': '
+            return frame_stamp, call_file, frame[2]
+
+    print "A benchmark is run for logger (%d messages):" % count
+    log_path = tempfile.mkdtemp()
+    try:
+        for label, stamper, level in (('inspect', InspectStamper(), 'info'),
+                                      ('stamper', CallStamper(3), 'info'),
+                                      ('no stamp', None, 'info'),
+                                      ('filtered', CallStamper(3), 'warning')):
+            logger = Logger(log_path, queued=True)
+            logger.stamper = stamper
+            logger.set_level(level)
+            start = time()
+            for index in xrange(count):
+                logger.info('Bar orientation is %s', 'south')
+            elapsed = time() - start
+            logger.close()
+            print '    %-10s %10.0f messages/s' % (label, count / elapsed)
+    finally:
+        shutil.rmtree(log_path)
+
+
 if __name__ == "__main__":
     
-    test_logger()
+    if 'benchmark' in sys.argv:
+        benchmark_logger()
+    else:
+        test_logger()
     
 
@@ -0,0 +1,415 @@
+#!/usr/bin/env python
+
+"""
+    Command-line tool to query structured (json) Qontrol logs.
+
+    Example, all errors from panel.py in the last hour:
+        python logquery.py --level error --file panel.py --since 1h
+"""
+
+from time import time, strftime, localtime
+from os import path
+import os
+import sys
+import mmap
+import gzip
+import json
+import locale
+import hashlib
+import optparse
+
+from logger import levels
+
+__version__ = "11.09.06.14.38"
+
+
+# records per index block
+BLOCK_SIZE = 256
+
+# bit of each record type in the level mask of a block
+level_bits = {'debug' : 1,
+              'info' : 2,
+              'warning' : 4,
+              'error' : 8,
+              'log error' : 16}
+
+
+################################################################################
+###                              LOG INDEX                                   ###
+################################################################################
+
+class LogIndex(object):
+
+    """
+        Sparse index of a log file: for every block of BLOCK_SIZE records it
+        keeps the byte range, the time range, a mask of the levels and the
+        calling files found in the block.
+        The index is saved next to the logs and extended, not rebuilt, while
+        the file it covers keeps growing. It is tied to the identity of that
+        file, see file_identity, so that a file rotated and recreated under
+        the same name gets a new index.
+    """
+
+    def __init__(self, log_name, index_name, identity=None):
+        self.log_name = log_name
+        self.index_name = index_name
+        self.identity = identity
+        # bytes of the log covered by the blocks
+        self.size = 0
+        self.blocks = []
+
+
+    def load(self, data_size=None):
+
+        """
+            Reads the saved index. Returns False if it is missing, damaged,
+            made for another file of that name, or covers more than the
+            data_size bytes of the log, if given.
+        """
+
+        try:
+            index_file = open(self.index_name, 'r')
+            try:
+                saved = json.load(index_file)
+            finally:
+                index_file.close()
+        except (IOError, ValueError):
+            return False
+
+        if saved.get('log') != path.basename(self.log_name) or \
+           saved.get('identity') != self.identity:
+            return False
+        if data_size is not None and saved.get('size', 0) > data_size:
+            return False
+
+        self.size = saved['size']
+        self.blocks = saved['blocks']
+        return True
+
+
+    def save(self):
+        temporary_name = self.index_name+'.tmp'
+        index_file = open(temporary_name, 'w')
+        try:
+            json.dump({'log' : path.basename(self.log_name),
+                       'identity' : self.identity,
+                       'size' : self.size,
+                       'blocks' : self.blocks}, index_file)
+        finally:
+            index_file.close()
+        os.rename(temporary_name, self.index_name)
+
+
+    def update(self, data):
+
+        """
+            Indexes the complete lines of data past the covered size.
+            Returns True if the index changed.
+        """
+
+        if len(data) <= self.size:
+            return False
+
+        offset = self.size
+        end = len(data)
+
+        # keep filling the last block if the file grew since
+        block = None
+        if self.blocks and self.blocks[-1]['count'] < BLOCK_SIZE:
+            block = self.blocks.pop()
+
+        while offset < end:
+            line_end = data.find('\n', offset)
+            if line_end < 0:
+                # partial line being written, index it next time
+                break
+            line_end += 1
+
+            record = parse(data[offset:line_end])
+            if record is not None:
+                if block is None:
+                    block = {'start' : offset,
+                             'end' : line_end,
+                             'first' : record['ts'],
+                             'last' : record['ts'],
+                             'levels' : 0,
+                             'files' : [],
+                             'count' : 0}
+                block['end'] = line_end
+                block['first'] = min(block['first'], record['ts'])
+                block['last'] = max(block['last'], record['ts'])
+                block['levels'] |= level_bits.get(record.get('level'), 0)
+                if record.get('file') not in block['files']:
+                    block['files'].append(record.get('file'))
+                block['count'] += 1
+                if block['count'] >= BLOCK_SIZE:
+                    self.blocks.append(block)
+                    block = None
+
+            offset = line_end
+
+        if block is not None:
+            self.blocks.append(block)
+
+        covered = self.size
+        self.size = offset
+        return offset > covered
+
+
+    def candidates(self, since, until, level_mask, file_name):
+
+        """
+            Returns the byte ranges of the blocks that may hold matches.
+        """
+
+        ranges = []
+        for block in self.blocks:
+            if since is not None and block['last'] < since:
+                continue
+            if until is not None and block['first'] > until:
+                continue
+            if not block['levels'] & level_mask:
+                continue
+            if file_name is not None and file_name not in block['files']:
+                continue
+            ranges.append((block['start'], block['end']))
+        return ranges
+
+
+
+################################################################################
+###                               QUERIES                                    ###
+################################################################################
+
+def parse(line):
+
+    """
+        Returns the record of a json log line, None for any other line.
+        Text records written before the configuration was read are skipped.
+    """
+
+    if not line.startswith('{'):
+        return None
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(record, dict) or 'ts' not in record:
+        return None
+    return record
+
+
+def open_log(log_name):
+
+    """
+        Returns the content of a log file: a memory map for plain files, the
+        decompressed bytes for gzipped segments. None if it is empty.
+    """
+
+    if log_name.endswith('.gz'):
+        archive = gzip.open(log_name, 'rb')
+        try:
+            return archive.read() or None
+        finally:
+            archive.close()
+
+    log_file = open(log_name, 'rb')
+    try:
+        if path.getsize(log_name) == 0:
+            return None
+        return mmap.mmap(log_file.fileno(), 0, access=mmap.ACCESS_READ)
+    finally:
+        # the map stays valid after the file is closed
+        log_file.close()
+
+
+def file_identity(log_name, status, data=None):
+
+    """
+        Returns what tells a log file apart from another one of the same name.
+        Gzipped segments never change: their inode, modification time and
+        size. Active files are renamed away on rotation and grow: their inode
+        and a hash of their first line, from data.
+    """
+
+    if log_name.endswith('.gz'):
+        return [status.st_ino, status.st_mtime, status.st_size]
+    first_line = data[:data.find('\n', 0, 4096) + 1 or 4096]
+    return [status.st_ino, hashlib.sha1(first_line).hexdigest()]
+
+
+def find_index(index_path, log_name, identity, data_size=None):
+
+    """
+        Loads the saved index of a log file, or starts an empty one.
+    """
+
+    index = LogIndex(log_name,
+                     path.join(index_path, path.basename(log_name)+'.idx'),
+                     identity)
+    if not index.load(data_size):
+        index = LogIndex(log_name, index.index_name, identity)
+    return index
+
+
+def query(log_path, since=None, until=None, level='debug', file_name=None,
+          session=None, text=None):
+
+    """
+        Yields the records of the logs in log_path matching every criterion.
+        since and until are epoch times, level the minimum level.
+    """
+
+    index_path = path.join(log_path, 'index')
+    if not path.isdir(index_path):
+        try:
+            os.makedirs(index_path)
+        except OSError:
+            # read-only log directory, indexes are rebuilt every time
+            pass
+
+    # records of at least the requested level
+    level_mask = level_bits['log error']
+    for name, value in levels.iteritems():
+        if value >= levels[level]:
+            level_mask |= level_bits[name]
+
+    log_names = sorted(name for name in os.listdir(log_path)
+                       if name.endswith('.log') or name.endswith('.log.gz'))
+
+    # indexes of logs removed by the retention policy are useless now
+    try:
+        index_names = os.listdir(index_path)
+    except OSError:
+        index_names = []
+    for name in index_names:
+        if name[:-len('.idx')] not in log_names:
+            try:
+                os.remove(path.join(index_path, name))
+            except OSError:
+                pass
+
+    for name in log_names:
+        log_name = path.join(log_path, name)
+        try:
+            status = os.stat(log_name)
+            if log_name.endswith('.gz'):
+                # a complete index spares decompressing segments without match
+                index = find_index(index_path, log_name,
+                                   file_identity(log_name, status))
+                if index.size and not index.candidates(since, until,
+                                                         level_mask, file_name):
+                    continue
+            data = open_log(log_name)
+        except (IOError, OSError):
+            continue
+        if data is None:
+            continue
+
+        if not log_name.endswith('.gz'):
+            index = find_index(index_path, log_name,
+                               file_identity(log_name, status, data), len(data))
+        if index.update(data):
+            try:
+                index.save()
+            except (IOError, OSError):
+                # read-only log directory, the index is rebuilt next time
+                pass
+
+        for start, end in index.candidates(since, until, level_mask, file_name):
+            for line in data[start:end].splitlines():
+                record = parse(line)
+                if record is None:
+                    continue
+                if since is not None and record['ts'] < since:
+                    continue
+                if until is not None and record['ts'] > until:
+                    continue
+                if not level_bits.get(record.get('level'), 0) & level_mask:
+                    continue
+                if file_name is not None and record.get('file') != file_name:
+                    continue
+                if session is not None and record.get('session') != session:
+                    continue
+                if text is not None and text not in record.get('msg', ''):
+                    continue
+                yield record
+
+
+def parse_time(value):
+
+    """
+        Turns '90s', '15m', '1h', '2d' into an epoch time that long ago, and
+        any other number into an epoch time.
+    """
+
+    units = {'s' : 1, 'm' : 60, 'h' : 3600, 'd' : 86400}
+    if value[-1:] in units:
+        return time() - float(value[:-1]) * units[value[-1]]
+    return float(value)
+
+
+def format_record(record):
+
+    """
+        Formats a record like the text log lines.
+    """
+
+    return ' '.join((strftime('%y.%m.%d.%H.%M.%S ', localtime(record['ts'])),
+                     '@File: '+str(record.get('file')).ljust(15)+\
+                     ' @Line: '+'%04d' % (record.get('line') or 0)+': ',
+                     record.get('level', '').upper().center(8),
+                     record.get('msg', '').encode('utf-8')))
+
+
+def main(arguments):
+    parser = optparse.OptionParser(usage='%prog [options]')
+    parser.add_option('--dir', default='~/.qontrol/log',
+                      help='log directory [%default]')
+    parser.add_option('--since', help="start time, epoch or ago like '1h'")
+    parser.add_option('--until', help="end time, epoch or ago like '10m'")
+    parser.add_option('--level', default='debug', choices=levels.keys(),
+                      help='minimum level [%default]')
+    parser.add_option('--file', help="calling file, like 'panel.py'")
+    parser.add_option('--session', help='session id')
+    parser.add_option('--grep', help='text the message contains')
+    parser.add_option('--json', action='store_true',
+                      help='print records as json')
+    options, remainder = parser.parse_args(arguments)
+
+    since = parse_time(options.since) if options.since else None
+    until = parse_time(options.until) if options.until else None
+
+    # records read from json hold unicode, arguments are bytes
+    encoding = locale.getpreferredencoding() or 'utf-8'
+    file_name, session, text = [decode_argument(value, encoding) for value
+                                in (options.file, options.session,
+                                    options.grep)]
+
+    for record in query(path.expanduser(options.dir), since, until,
+                        options.level, file_name, session, text):
+        if options.json:
+            print json.dumps(record)
+        else:
+            print format_record(record)
+
+
+def decode_argument(value, encoding):
+
+    """
+        Returns the command-line argument as unicode, decoded from the locale
+        encoding, or from UTF-8 if it is not valid in it.
+    """
+
+    if value is None:
+        return None
+    try:
+        return value.decode(encoding)
+    except (UnicodeDecodeError, LookupError):
+        return value.decode('utf-8', 'replace')
+
+
+if __name__ == "__main__":
+
+    main(sys.argv[1:])
+
@@ -2,35 +2,356 @@
 
 from PyQt4 import QtGui, QtCore
 
+import providers
+
 __version__ = "11.09.06.14.38"
 
 
 
+class Indicator(QtGui.QPushButton):
+
+    """
+        Button standing for a page on the panel's bar. It is made with the
+        page descriptor, long before the page itself.
+        Its state, a badge count, an urgency and a text, is changed by posting
+        to it: posts are coalesced and applied at most once per frame by the
+        application's indicator pipeline. The urgency is the "urgency"
+        property of the button in style sheets, eg.
+            Indicator[urgency="high"] {color: red;}
+    """
+
+    def __init__(self, name):
+        QtGui.QPushButton.__init__(self, name+' Indicator')
+        self.name = name
+        self.count = 0
+        self.urgency = 'none'
+        self.label = None
+        self.setProperty('urgency', QtCore.QVariant(self.urgency))
+
+
+    def post(self, count=None, urgency=None, text=None):
+
+        """
+            Posts a change of state, arguments left to None keep their value.
+            Cheap enough to call for every event of a page.
+        """
+
+        QtCore.QCoreApplication.instance().indicators.post(self, count,
+                                                           urgency, text)
+
+
+    def apply_state(self, count, urgency, text):
+
+        """
+            Shows the state, called by the indicator pipeline.
+        """
+
+        if count is not None:
+            self.count = count
+        if text is not None:
+            self.label = text
+        label = self.label or self.name+' Indicator'
+        if self.count:
+            label += ' (%d)' % self.count
+        self.setText(label)
+
+        if urgency is not None and urgency != self.urgency:
+            self.urgency = urgency
+            self.setProperty('urgency', QtCore.QVariant(urgency))
+            # property selectors are only matched when polishing
+            self.style().unpolish(self)
+            self.style().polish(self)
+
+
+
+class PageDescriptor(object):
+
+    """
+        Lightweight part of a page, made at startup for every page in the
+        configuration: its name, plugin and indicator. The page widget is
+        only built on first use, into the slot the stack holds for it, which
+        is when the plugin module gets imported. A page released to save
+        memory leaves its state with the descriptor until it is rebuilt.
+    """
+
+    def __init__(self, name, plugin):
+        self.name = name
+        self.plugin = plugin
+        self.indicator = Indicator(name)
+        # placeholder widget in the stack, set by the stack
+        self.slot = None
+        self.page = None
+        # state saved by the page when it was last released
+        self.state = None
+        # use count of the stack when the page was last resumed, 0 if never
+        self.last_used = 0
+
+
+    def build(self):
+
+        """
+            Builds the page into its slot, once. Returns the page.
+        """
+
+        if self.page is None:
+            # a plugin that fails to load still gets a page
+            page_type = self.plugin.load() or DummyPage
+            self.page = page_type(self.slot, self)
+            self.slot.layout().addWidget(self.page)
+            # shown now rather than on the next event loop pass, to be drawn
+            # into a snapshot right away
+            self.page.show()
+            if self.state is not None:
+                self.page.restore_state(self.state)
+                self.state = None
+        return self.page
+
+
+    def release(self):
+
+        """
+            Tears the page down after saving its state, keeping the slot and
+            indicator. The page is built again by the next call to build.
+        """
+
+        if self.page is None:
+            return
+        page = self.page
+        page.suspend()
+        page.application.scheduler.unregister_page(page)
+        self.state = page.save_state()
+        self.slot.layout().removeWidget(page)
+        page.hide()
+        page.deleteLater()
+        self.page = None
+
+
+
 class Page(QtGui.QFrame):
 
     """
         Page populating the QStackedLayout of the dashboard, it can contain
-        widgets. It owns an indicator that is placed on the panel's bar.    
+        widgets. Its indicator, placed on the panel's bar, belongs to its
+        descriptor.
+        A page that looks different should call notify_changed, so that the
+        snapshot of it slid with the dashboard is grabbed again.
+        A page is active while it is the current page of a shown dashboard.
+        Refresh callbacks, timers and workers registered with the page only
+        run while it is active, subclasses can also override on_shown,
+        on_hidden and on_dashboard_hidden.
     """
 
-    def __init__(self, parent, name):
+    def __init__(self, parent, descriptor):
         QtGui.QFrame.__init__(self, parent)
+        name = descriptor.name
 
         # Get the QApplication's instance
         self.application = QtCore.QCoreApplication.instance()
 
         # Set up logger
         self.logger = self.application.logger
-        self.logger.info('Logger at '+name+' ready.')
+        self.logger.info('Logger at %s ready.', name)
 
         # Set Geometry
 #        self.setFixedSize(self.parent().maximumWidth(), 
 #                                self.parent().maximumHeight())
 #        self.logger.info('Size of page '+name+' set to:'+ \
 #                          str(self.maximumWidth())+'*'+str(self.maximumHeight()))
-        
-        # TODO: Indicator will need its own class for styling reference
-        self.indicator = QtGui.QPushButton(name+' Indicator')
+
+        self.descriptor = descriptor
+        self.indicator = descriptor.indicator
+
+        # Pixmap of the stack showing this page, grabbed by the stack
+        self.snapshot = None
+
+        # Lifecycle, driven by the stack
+        self.active = False
+        self.timers = []
+        self.workers = []
+        self.refreshes = []
+
+        # Runs background data jobs, made on first declaration
+        self.provider = None
+
+
+    def declare_job(self, name, function, callback, process=False):
+
+        """
+            Declares a background data job of the page: function runs on the
+            application's thread pool, or process pool if process is set, and
+            callback gets its result on the GUI thread. See providers.py.
+        """
+
+        if self.provider is None:
+            self.provider = providers.Provider(self, self.application.providers)
+        self.provider.declare(name, function, callback, process)
+
+
+    def request_job(self, name, *args):
+
+        """
+            Runs the declared job with the arguments. Results of former
+            requests of the job are dropped.
+        """
+
+        self.provider.request(name, *args)
+
+
+    def notify_changed(self):
+
+        """
+            Drops the snapshot of the page and emits changed().
+        """
+
+        self.snapshot = None
+        self.emit(QtCore.SIGNAL('changed()'))
+
+
+    def register_refresh(self, callback, period, slack=None):
+
+        """
+            Has the application's refresh scheduler call callback every period
+            ms while the page is active, up to slack ms late. Preferred over
+            a timer, see scheduler.py.
+        """
+
+        refresh = self.application.scheduler.register(callback, period, slack,
+                                                      self)
+        self.refreshes.append(refresh)
+        return refresh
+
+
+    def register_timer(self, timer):
+
+        """
+            Has the QTimer run only while the page is active. The timer is
+            started now if it is.
+        """
+
+        self.timers.append(timer)
+        if self.active:
+            timer.start()
+
+
+    def register_worker(self, worker):
+
+        """
+            Has the worker, any object with pause() and resume() methods, run
+            only while the page is active. The worker is paused now if it is
+            not.
+        """
+
+        self.workers.append(worker)
+        if not self.active:
+            worker.pause()
+
+
+    def resume(self):
+
+        """
+            Activates the page: restarts its timers and workers and calls
+            on_shown.
+        """
+
+        if self.active:
+            return
+        self.active = True
+        for timer in self.timers:
+            timer.start()
+        for worker in self.workers:
+            worker.resume()
+        if self.refreshes:
+            self.application.scheduler.reschedule()
+        self.logger.debug('Page %s resumed.', self.descriptor.name)
+        self.on_shown()
+
+
+    def suspend(self, dashboard_hidden=False):
+
+        """
+            Deactivates the page: stops its timers and pauses its workers,
+            then calls on_hidden, and on_dashboard_hidden if the page stays
+            current while the dashboard hides.
+        """
+
+        if not self.active:
+            return
+        self.active = False
+        for timer in self.timers:
+            timer.stop()
+        for worker in self.workers:
+            worker.pause()
+        if self.refreshes:
+            self.application.scheduler.reschedule()
+        # results would be stale by the time the page is shown again
+        if self.provider is not None:
+            self.provider.cancel()
+        self.logger.debug('Page %s suspended.', self.descriptor.name)
+        self.on_hidden()
+        if dashboard_hidden:
+            self.on_dashboard_hidden()
+
+
+    def on_shown(self):
+
+        """
+            Called when the page becomes visible, to be overridden.
+        """
+
+        pass
+
+
+    def on_hidden(self):
+
+        """
+            Called when the page stops being visible, to be overridden.
+        """
+
+        pass
+
+
+    def on_dashboard_hidden(self):
+
+        """
+            Called after on_hidden when the dashboard hides on this page, to
+            be overridden.
+        """
+
+        pass
+
+
+    def memory_usage(self):
+
+        """
+            Returns the bytes held by the page, that count against the
+            dashboard memory budget: those of its snapshot, if it has one.
+            Pages caching data should add the size of it.
+        """
+
+        if self.snapshot is None:
+            return 0
+        return self.snapshot.width() * self.snapshot.height() * \
+               self.snapshot.depth() / 8
+
+
+    def save_state(self):
+
+        """
+            Returns the lightweight state of the page to restore when it is
+            rebuilt after being released, eg. a scroll position or a query.
+            It should be small and must not reference widgets.
+        """
+
+        return None
+
+
+    def restore_state(self, state):
+
+        """
+            Restores the state returned by save_state on a rebuilt page.
+        """
+
+        pass
 
 #################################################################################
 ####                          PAGE ORIENTED CLASS                             ###
@@ -81,10 +402,11 @@ class DummyPage(Page):
         Dummy page used for testing dashboard.    
     """
     
-    def __init__(self, parent, name):
-        Page.__init__(self, parent, name)
+    def __init__(self, parent, descriptor):
+        Page.__init__(self, parent, descriptor)
+        name = descriptor.name
 
-        self.logger.info('Parent of '+name+' is '+str(self.parent()))
+        self.logger.info('Parent of %s is %s', name, self.parent())
 
         self.label = QtGui.QLabel(QtCore.QString('<h1>'+name.upper()+'</h1>'), self)
         self.layout = QtGui.QHBoxLayout()
@@ -92,3 +414,90 @@ class DummyPage(Page):
         self.layout.addWidget(self.label)
         self.setLayout(self.layout)
 
+
+
+################################################################################
+###                               LOG PAGE                                   ###
+################################################################################
+
+
+class LogPage(Page):
+
+    """
+        Page showing the last records of the logger live.
+        New records are appended from the logger's ring buffer while the page
+        is active, the view never holds more lines than the buffer does.
+    """
+
+    def __init__(self, parent, descriptor):
+        Page.__init__(self, parent, descriptor)
+
+        # sequence number of the last record shown
+        self.sequence = 0
+        # scroll position to restore once the records are shown, None to
+        # follow the last record
+        self.restored_scroll = None
+
+        self.view = QtGui.QPlainTextEdit(self)
+        self.view.setReadOnly(True)
+        self.view.setMaximumBlockCount(self.logger.ring.maxlen)
+        self.layout = QtGui.QHBoxLayout()
+        self.layout.setContentsMargins(0, 0, 0, 0)
+        self.layout.addWidget(self.view)
+        self.setLayout(self.layout)
+
+        # poll the ring buffer only while the page is active
+        self.register_refresh(self.append_records, 250)
+
+
+    def on_shown(self):
+        self.append_records()
+        if self.restored_scroll is not None:
+            self.view.verticalScrollBar().setValue(self.restored_scroll)
+            self.restored_scroll = None
+
+
+    def memory_usage(self):
+        # the text of the view, as QString characters
+        return Page.memory_usage(self) + \
+               self.view.document().characterCount() * 2
+
+
+    def save_state(self):
+
+        """
+            Returns the scroll position of the view, None if it follows the
+            last record. The records themselves are read again from the
+            logger's ring buffer.
+        """
+
+        if self.restored_scroll is not None:
+            return {'scroll' : self.restored_scroll}
+        scroll_bar = self.view.verticalScrollBar()
+        if scroll_bar.value() == scroll_bar.maximum():
+            return {'scroll' : None}
+        return {'scroll' : scroll_bar.value()}
+
+
+    def restore_state(self, state):
+        self.append_records()
+        self.restored_scroll = state.get('scroll')
+
+
+    def append_records(self):
+
+        """
+            Appends the records logged since the last call to the view.
+        """
+
+        records = self.logger.records_since(self.sequence)
+        if not records:
+            return
+        self.view.appendPlainText('\n'.join(record[2] for record in records))
+        self.sequence = records[-1][0]
+        self.notify_changed()
+
+
+
+# page classes for pages configured by name only, others are DummyPages
+page_types = {'Log' : LogPage}
@@ -26,14 +26,13 @@ class Panel(QtGui.QFrame):
 
         # Reference orientation
         self.orientation = orientation
-        self.logger.info('Panel orientation is '+self.orientation)
+        self.logger.info('Panel orientation is %s', self.orientation)
 
         # Get screen geometry
         self.screen_width = int(QtGui.QDesktopWidget().screenGeometry().width())
         self.screen_height = int(QtGui.QDesktopWidget().screenGeometry().height())
-        self.logger.info('Screen geometry is '+ \
-                          str(self.screen_width)+'*'+ \
-                          str(self.screen_height))
+        self.logger.info('Screen geometry is %d*%d',
+                          self.screen_width, self.screen_height)
 
         # Make layout
         self.layout = self.make_layout()
@@ -65,6 +64,18 @@ class Panel(QtGui.QFrame):
         self.set_reserved_space()
 
 
+    def apply_configuration(self):
+
+        """
+            Re-arranges the Bar and the Panel around it after a change of the
+            panel configuration. Reserved space must be requested again.
+        """
+
+        self.bar.apply_configuration()
+        self.set_geometry()
+        self.set_reserved_space()
+
+
     def set_reserved_space(self):
         
         """
@@ -99,14 +110,14 @@ class Panel(QtGui.QFrame):
         if self.orientation in ('north', 'south'):
             # Horizontal
             self.setFixedWidth(self.screen_width)
-            self.logger.info('Width of panel fixed at '+ \
-                             str(self.maximumWidth()))
+            self.logger.info('Width of panel fixed at %d',
+                             self.maximumWidth())
         
         elif self.orientation in ('west', 'east'):
             # Vertical
             self.setFixedHeight(self.screen_height)
-            self.logger.info('Height of panel fixed at '+ \
-                             str(self.maximumHeight()))
+            self.logger.info('Height of panel fixed at %d',
+                             self.maximumHeight())
         else:
             # This shouldn't happen, but we never know
             self.logger.error("I need a proper layout :( ")
@@ -114,8 +125,8 @@ class Panel(QtGui.QFrame):
 
         # Reduce size to minimum necessary        
         self.adjustSize()
-        self.logger.info('Size of Panel adjusted to: '+\
-                         str(self.width())+'*'+str(self.height()))
+        self.logger.info('Size of Panel adjusted to: %d*%d',
+                         self.width(), self.height())
 
 
         # Find out where to anchor the panel
@@ -135,7 +146,7 @@ class Panel(QtGui.QFrame):
         if self.orientation in ('north', 'west', 'east'):
             pos_y = 0
 
-        if self.orientation in ('south'):
+        elif self.orientation in ('south'):
             pos_y = self.screen_height - self.bar.maximumHeight()
 
         else:
@@ -144,8 +155,8 @@ class Panel(QtGui.QFrame):
             QtCore.QCoreApplication.quit()
         
         self.anchor_position = QtCore.QPoint(pos_x, pos_y)
-        self.logger.info('Anchor for Panel set at '+ \
-                         str(self.anchor_position))
+        self.logger.info('Anchor for Panel set at %s',
+                         self.anchor_position)
         self.move(self.anchor_position)
 
        
@@ -231,7 +242,7 @@ class Bar(QtGui.QFrame):
 
         # Reference orientation
         self.orientation = orientation
-        self.logger.info('Bar orientation is '+self.orientation)
+        self.logger.info('Bar orientation is %s', self.orientation)
 
         # Make layout:
         self.layout = self.make_layout()
@@ -264,6 +275,18 @@ class Bar(QtGui.QFrame):
             self.logger.error("I need a proper layout :( ")
             QtCore.QCoreApplication.quit()
 
+        self.arrange_layout(layout)
+
+        return layout
+
+
+    def arrange_layout(self, layout):
+
+        """
+            Sets button alignment, spacing and margins of the layout according
+            to configuration.
+        """
+
         # Set button alignment
         alignment_options = {'left' : QtCore.Qt.AlignLeft,
                              'right' : QtCore.Qt.AlignRight,
@@ -271,27 +294,16 @@ class Bar(QtGui.QFrame):
                              'bottom' : QtCore.Qt.AlignBottom,
                              'center' : QtCore.Qt.AlignCenter
                             }
-        alignment = self.application.configuration['panel']['button-alignment']
-        # Check if requested alignment is coherent with orientation
-        if alignment in ('left', 'right') and self.orientation in ('west', 'east'):
-            # not coherent
-            self.logger.warn('Button alignment is not coherent with orientation.')
-            alignment = center
-        if alignment in ('top', 'bottom') and self.orientation in ('north', 'east'):
-            # not coherent
-            self.logger.warn('Button alignment is not coherent with orientation.')
-            alignment = center
-        # Alignment now coherent
-        layout.setAlignment(alignment_options[alignment])
+        panel_configuration = self.application.configuration.panel
+        # Alignment was checked for coherence with orientation in configuration
+        layout.setAlignment(alignment_options[panel_configuration.button_alignment])
 
         # Arrange margins and padding:
-        layout.setSpacing(self.application.configuration['panel']['button-spacing'])
-        layout.setContentsMargins(self.application.configuration['panel']['margin-vertical'], # Left
-                                  self.application.configuration['panel']['margin-horizontal'], # Top
-                                  self.application.configuration['panel']['margin-vertical'], # Right
-                                  self.application.configuration['panel']['margin-horizontal'],) # Bottom
-
-        return layout
+        layout.setSpacing(panel_configuration.button_spacing)
+        layout.setContentsMargins(panel_configuration.margin_vertical, # Left
+                                  panel_configuration.margin_horizontal, # Top
+                                  panel_configuration.margin_vertical, # Right
+                                  panel_configuration.margin_horizontal) # Bottom
 
 
 
@@ -307,19 +319,19 @@ class Bar(QtGui.QFrame):
         if self.orientation in ('north', 'south'):
             # Horizontal
             self.setFixedWidth(self.parent().screen_width)
-            self.logger.info('Width of Bar fixed at '+ \
-                             str(self.maximumWidth()))
-            self.setFixedHeight(self.application.configuration['panel']['thickness'])
-            self.logger.info('Height of Bar fixed at '+ \
-                             str(self.maximumHeight()))
+            self.logger.info('Width of Bar fixed at %d',
+                             self.maximumWidth())
+            self.setFixedHeight(self.application.configuration.panel.thickness)
+            self.logger.info('Height of Bar fixed at %d',
+                             self.maximumHeight())
         elif self.orientation in ('west', 'east'):
             # Vertical
             self.setFixedHeight(self.parent().screen_height)
-            self.logger.info('Height of Bar fixed at '+ \
-                             str(self.maximumHeight()))
-            self.setFixedWidth(self.application.configuration['panel']['thickness'])
-            self.logger.info('Width of Bar fixed at '+ \
-                             str(self.maximumWidth()))
+            self.logger.info('Height of Bar fixed at %d',
+                             self.maximumHeight())
+            self.setFixedWidth(self.application.configuration.panel.thickness)
+            self.logger.info('Width of Bar fixed at %d',
+                             self.maximumWidth())
         else:
             # This shouldn't happen, but we never know
             self.logger.error("I need a proper layout :( ")
@@ -327,6 +339,16 @@ class Bar(QtGui.QFrame):
 
         
 
+    def apply_configuration(self):
+
+        """
+            Re-arranges the Bar after a change of the panel configuration.
+        """
+
+        self.arrange_layout(self.layout)
+        self.set_geometry()
+
+
     def make_buttons(self):
         
         """
@@ -337,14 +359,12 @@ class Bar(QtGui.QFrame):
             dashboard when hidden.
         """
         
-        # get index of pages on dashboard stack
-        count = self.application.dashboard.stack.layout.count()  
-        self.logger.info("Panel found "+str(count)+" pages on dashboard.")
-        for index in range(0, count):
-            # Get page            
-            page = self.application.dashboard.stack.layout.widget(index)
-            # Get indicator from that page            
-            indicator = page.indicator
+        # get descriptors of pages on dashboard stack, pages may not be built
+        descriptors = self.application.dashboard.stack.descriptors
+        self.logger.info("Panel found %d pages on dashboard.", len(descriptors))
+        for index, descriptor in enumerate(descriptors):
+            # Get indicator from that page's descriptor
+            indicator = descriptor.indicator
             # Make the bar the parent of the indicator
             indicator.setParent(self)
             # append index to button for reference
@@ -354,32 +374,45 @@ class Bar(QtGui.QFrame):
                          self.check_stack_index)
             self.layout.addWidget(indicator)
 
+
+    def release_buttons(self):
+
+        """
+            Disconnects the page indicators from this Bar, so that another Bar
+            can take them over.
+        """
+
+        for descriptor in self.application.dashboard.stack.descriptors:
+            indicator = descriptor.indicator
+            self.disconnect(indicator, QtCore.SIGNAL('clicked()'),
+                            self.check_stack_index)
+            self.layout.removeWidget(indicator)
+
     
     def check_stack_index(self):
         
         """
             Checks the index of the stack to see if it needs a switch or
-            a show/hide action.        
+            a show/hide action. Clicks during a slide turn it around or
+            switch the page sliding in.
         """
 
         button_index = self.sender().index
-        print "Button index is", button_index
+        self.logger.debug("Button index is %d", button_index)
         
         page_index = self.application.dashboard.stack.layout.currentIndex()
-        print "Current page index is", page_index
-
-        if button_index == page_index and self.application.dashboard.pos() == self.application.dashboard.hide_position:
-            self.application.dashboard.show_dashboard()
-
-        elif button_index == page_index and self.application.dashboard.pos() == self.application.dashboard.show_position:
-            self.application.dashboard.hide_dashboard()
+        self.logger.debug("Current page index is %d", page_index)
 
-        elif button_index != page_index and self.application.dashboard.pos() == self.application.dashboard.hide_position:
-            self.application.dashboard.stack.layout.setCurrentIndex(button_index)
-            self.application.dashboard.show_dashboard()
+        if button_index == page_index:
+            # show or hide, from wherever the dashboard is
+            self.application.dashboard.check_position()
         
         else:
-            self.application.dashboard.stack.layout.setCurrentIndex(button_index)
+            # the page switched to is resumed, the previous one suspended
+            self.application.dashboard.show_page(button_index)
+            # Remember the page for next start
+            self.application.update_config('dashboard', 'current-page',
+                                           button_index)
         
         
         
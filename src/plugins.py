@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+
+"""
+    Registry of the page plugins named in the dashboard configuration.
+
+    A page plugin is a class deriving from pages.Page, found by module and
+    class name, eg. {"name" : "Log", "module" : "pages", "class" : "LogPage"}.
+    Modules are looked for in ~/.qontrol/plg, then next to qontrol.py.
+    At startup plugins are only located, their module is imported the first
+    time one of their pages is built, off the startup critical path.
+"""
+
+import os
+import sys
+import imp
+import time
+
+import pages
+
+__version__ = "11.09.06.14.38"
+
+
+
+class PluginError(Exception):
+    pass
+
+
+class Plugin(object):
+
+    """
+        Metadata of a page plugin, recorded without importing its module.
+        load() imports the module and returns the page class.
+    """
+
+    def __init__(self, registry, module_name, class_name, address):
+        self.registry = registry
+        self.module_name = module_name
+        self.class_name = class_name
+        # file the module is loaded from, None for modules already imported
+        self.address = address
+        self.page_type = None
+
+
+    def load(self):
+
+        """
+            Returns the page class, importing its module the first time.
+            Returns None if the plugin cannot be loaded.
+        """
+
+        if self.page_type is None:
+            try:
+                self.page_type = self.registry.load(self)
+            except PluginError as error:
+                self.registry.logger.error('Plugin %s.%s could not be loaded: '
+                                           '%s', self.module_name,
+                                           self.class_name, error)
+        return self.page_type
+
+
+
+class PluginRegistry(object):
+
+    """
+        Records the plugins of the configured pages, one Plugin per module
+        and class, and imports their modules on demand.
+    """
+
+    def __init__(self, search_path, logger):
+        self.search_path = search_path
+        self.logger = logger
+        # (module name, class name): Plugin
+        self.plugins = {}
+
+
+    def register(self, module_name, class_name):
+
+        """
+            Returns the Plugin for the class of the module, locating the module
+            without importing it. A module that cannot be found is reported
+            now and gives a Plugin that does not load.
+        """
+
+        key = (module_name, class_name)
+        if key in self.plugins:
+            return self.plugins[key]
+
+        address = None
+        if module_name not in sys.modules:
+            try:
+                address = self.find(module_name)
+            except PluginError as error:
+                self.logger.error('Plugin %s.%s: %s', module_name, class_name,
+                                  error)
+
+        plugin = Plugin(self, module_name, class_name, address)
+        self.plugins[key] = plugin
+        self.logger.debug('Plugin %s.%s registered.', module_name, class_name)
+        return plugin
+
+
+    def find(self, module_name):
+
+        """
+            Returns the address of the module along the search path.
+        """
+
+        try:
+            module_file, address, description = imp.find_module(module_name,
+                                                                self.search_path)
+        except ImportError:
+            raise PluginError('no module "%s" in %s' % (module_name,
+                                                    ', '.join(self.search_path)))
+        if module_file is not None:
+            module_file.close()
+        return address
+
+
+    def load(self, plugin):
+
+        """
+            Imports the module of the plugin if needed and returns its class,
+            which must be a subclass of pages.Page.
+        """
+
+        module = sys.modules.get(plugin.module_name)
+        if module is None:
+            if plugin.address is None:
+                raise PluginError('module was not found')
+            start = time.time()
+            try:
+                module_file, address, description = imp.find_module(
+                                                        plugin.module_name,
+                                                        [os.path.dirname(plugin.address)])
+                try:
+                    module = imp.load_module(plugin.module_name, module_file,
+                                             address, description)
+                finally:
+                    if module_file is not None:
+                        module_file.close()
+            except Exception as error:
+                raise PluginError('import failed: %s' % error)
+            self.logger.info('Plugin module %s imported in %.1f ms.',
+                             plugin.module_name, (time.time() - start) * 1000)
+
+        try:
+            page_type = getattr(module, plugin.class_name)
+        except AttributeError:
+            raise PluginError('module %s has no class %s' % (plugin.module_name,
+                                                             plugin.class_name))
+        if not isinstance(page_type, type) or \
+           not issubclass(page_type, pages.Page):
+            raise PluginError('%s.%s is not a Page subclass' % (
+                                        plugin.module_name, plugin.class_name))
+        return page_type
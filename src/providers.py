@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+
+"""
+    Background data jobs of pages.
+
+    A page declares its jobs, eg. reading a file or computing stats, with the
+    function to run and the callback taking the result:
+        self.declare_job('stats', compute_stats, self.show_stats)
+        self.request_job('stats', path)
+    Jobs run on the shared, bounded thread pool of the application, or on its
+    process pool for CPU-bound work (the function and its arguments must then
+    be picklable). The process pool is forked by start_process_pool before
+    the application starts any thread or connects to X: a child forked later
+    could deadlock on a lock another thread held, and would share the X
+    socket. Callbacks are called on the GUI thread through a queued Qt
+    signal. Requesting a job again, suspending or releasing the page makes
+    the results of former requests stale: they are dropped, and queued
+    thread jobs are not even run.
+"""
+
+import multiprocessing
+import traceback
+
+from PyQt4 import QtCore
+
+__version__ = "11.09.06.14.38"
+
+
+
+def start_process_pool(processes):
+
+    """
+        Starts the process pool, to call while the process has a single
+        thread and no X connection.
+    """
+
+    return multiprocessing.Pool(processes)
+
+
+def run_job(function, args):
+
+    """
+        Runs the function and returns (True, result), or (False, traceback)
+        if it raised. Module level, for process pools to pickle it.
+    """
+
+    try:
+        return True, function(*args)
+    except Exception:
+        return False, traceback.format_exc()
+
+
+
+################################################################################
+###                              PROVIDER POOL                               ###
+################################################################################
+
+class ProviderPool(object):
+
+    """
+        Thread pool and process pool shared by the providers of all pages.
+        The process pool, of a fixed size, comes from start_process_pool.
+    """
+
+    def __init__(self, threads, process_pool, logger):
+        self.logger = logger
+        self.thread_pool = QtCore.QThreadPool()
+        self.process_pool = process_pool
+        self.configure(threads)
+
+
+    def configure(self, threads):
+
+        """
+            Bounds the thread pool. The process pool is never forked again,
+            its size is only read at startup.
+        """
+
+        self.thread_pool.setMaxThreadCount(threads)
+        self.logger.info('Provider thread pool bounded to %d threads.',
+                         threads)
+
+
+    def run_thread(self, task):
+        self.thread_pool.start(task)
+
+
+    def run_process(self, function, args, callback):
+        self.process_pool.apply_async(run_job, (function, args),
+                                      callback=callback)
+
+
+    def close(self):
+
+        """
+            Stops the pools, waiting shortly for running thread jobs.
+        """
+
+        self.thread_pool.waitForDone(1000)
+        if self.process_pool is not None:
+            self.process_pool.terminate()
+            self.process_pool = None
+
+
+
+class ThreadTask(QtCore.QRunnable):
+
+    """
+        Job request run on the thread pool, skipped if stale by then.
+    """
+
+    def __init__(self, provider, name, generation, function, args):
+        QtCore.QRunnable.__init__(self)
+        self.provider = provider
+        self.name = name
+        self.generation = generation
+        self.function = function
+        self.args = args
+
+
+    def run(self):
+        if not self.provider.is_current(self.name, self.generation):
+            return
+        outcome = run_job(self.function, self.args)
+        self.provider.report(self.name, self.generation, outcome)
+
+
+
+################################################################################
+###                                PROVIDER                                  ###
+################################################################################
+
+class Job(object):
+
+    """
+        Data job declared by a page.
+    """
+
+    def __init__(self, function, callback, process):
+        self.function = function
+        self.callback = callback
+        self.process = process
+        # number of the last request, older results are stale
+        self.generation = 0
+
+
+
+class Provider(QtCore.QObject):
+
+    """
+        Runs the declared jobs of a page on the provider pool and delivers
+        their current results on the GUI thread.
+    """
+
+    def __init__(self, page, pool):
+        QtCore.QObject.__init__(self, page)
+        self.page = page
+        self.pool = pool
+        self.logger = page.logger
+        self.jobs = {}
+        self.connect(self, QtCore.SIGNAL('reported(PyQt_PyObject)'),
+                     self.deliver, QtCore.Qt.QueuedConnection)
+
+
+    def declare(self, name, function, callback, process=False):
+        self.jobs[name] = Job(function, callback, process)
+
+
+    def request(self, name, *args):
+
+        """
+            Runs the job with the arguments, superseding former requests.
+        """
+
+        job = self.jobs[name]
+        job.generation += 1
+        generation = job.generation
+
+        if job.process:
+            self.pool.run_process(job.function, args,
+                                  lambda outcome: self.report(name, generation,
+                                                              outcome))
+        else:
+            self.pool.run_thread(ThreadTask(self, name, generation,
+                                            job.function, args))
+
+
+    def cancel(self, name=None):
+
+        """
+            Makes the pending requests of the job, or of all jobs, stale.
+        """
+
+        for job_name, job in self.jobs.iteritems():
+            if name is None or job_name == name:
+                job.generation += 1
+
+
+    def is_current(self, name, generation):
+        return self.jobs[name].generation == generation
+
+
+    def report(self, name, generation, outcome):
+
+        """
+            Hands the outcome over to the GUI thread, from a pool thread.
+        """
+
+        try:
+            self.emit(QtCore.SIGNAL('reported(PyQt_PyObject)'),
+                      (name, generation, outcome))
+        except RuntimeError:
+            # the page was released meanwhile
+            pass
+
+
+    def deliver(self, report):
+        name, generation, (succeeded, value) = report
+        if not self.is_current(name, generation):
+            self.logger.debug('Stale result of job %s dropped.', name)
+            return
+        if not succeeded:
+            self.logger.error('Job %s of page %s failed: %s', name,
+                              self.page.descriptor.name, value)
+            return
+        self.jobs[name].callback(value)
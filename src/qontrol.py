@@ -12,11 +12,28 @@ __version__ = '11.09.06.14.37'
 
 import sys
 import os
+
+# A second launch only hands its arguments over to the running Qontrol,
+# before paying for the imports of PyQt and Xlib.
+if __name__ == "__main__":
+    import qontrolctl
+    if qontrolctl.forward(sys.argv[1:]):
+        sys.exit(0)
+
+import time
 import json # used to get and set configuration file
 from PyQt4 import QtGui, QtCore
 
 import xwindow # module used to grab window on X for reserving space
 from logger import Logger
+import config # used to validate configuration
+import theme # used to compile style sheets
+import plugins # used to find page plugins
+import providers # used to run page data jobs in the background
+import scheduler # used to refresh pages on shared timer ticks
+import indicators # used to coalesce indicator updates
+import channel # used to set indicators from files dropped in ~/.qontrol/ind
+import control # used to drive Qontrol through a local socket
 
 import panel
 import dashboard
@@ -37,6 +54,11 @@ class Application(QtGui.QApplication):
     """
     
     def __init__(self):
+        # fork the processes of page jobs while Qontrol has a single thread
+        # and no X connection, see providers.py
+        process_pool = providers.start_process_pool(config.read(
+                    os.path.expanduser('~/.qontrol/cnf/user.cnf')
+                    ).providers.processes)
         QtGui.QApplication.__init__(self, sys.argv)
         
         # enumerate path to user home and subdirectories        
@@ -45,15 +67,21 @@ class Application(QtGui.QApplication):
                     'log'   :   os.path.expanduser('~/.qontrol/log'),
                     'cnf'   :   os.path.expanduser('~/.qontrol/cnf'),
                     'thm'   :   os.path.expanduser('~/.qontrol/thm'),
-                    'ind'   :   os.path.expanduser('~/.qontrol/ind')
+                    'plg'   :   os.path.expanduser('~/.qontrol/plg'),
+                    'ind'   :   os.path.expanduser('~/.qontrol/ind'),
+                    'cache' :   os.path.expanduser('~/.qontrol/cache')
                                 }
         
         # get verbose option for logger        
         self.verbose = True if 'verbose' in sys.argv else False        
+
+        # get call-site stamp option for logger, 'nostamp' turns it off
+        self.stamp = False if 'nostamp' in sys.argv else True
         
-        # create logger and pass in the verbose option
+        # create logger and pass in the verbose and stamp options
         try:
-            self.logger = Logger(self.directories['log'], self.verbose)
+            self.logger = Logger(self.directories['log'], self.verbose,
+                                 stamp=self.stamp)
         except IOError as error:
             if error[0] == 2:
                 # in that case the path does not exist and it should be created
@@ -61,48 +89,83 @@ class Application(QtGui.QApplication):
                 self.make_directories()
                 try:
                     # try making the logger again
-                    self.logger = Logger(self.directories['log'], self.verbose)
+                    self.logger = Logger(self.directories['log'], self.verbose,
+                                         stamp=self.stamp)
                 except:
                     raise                
             else:
                 raise error
-        
+
+        # write out queued log records before the event loop returns
+        self.connect(self, QtCore.SIGNAL('aboutToQuit()'), self.logger.close)
+
         # define default configuration
-        self.default_configuration = {
-                                      'style' : 'default',
-                                      'language' : 'english',
-                                      'orientation' : 'south',
-                                      'dashboard' : {'ratio' : 0.8,
-                                                     'pages' : ['Page 01',
-                                                                'Page 02',
-                                                                'Page 03',
-                                                                'Page 04']},
-                                      'panel' : {'margin-vertical' : 2,
-                                                 'margin-horizontal' : 2,
-                                                 'button-spacing' : 2,
-                                                 'button-alignment' : 'center',
-                                                 'thickness' : 25}
-                                      }
+        self.default_configuration = config.defaults
+
+        # content of the configuration file as last written by Qontrol, and
+        # the runtime changes not written yet, as {(section, key) : value}
+        self.written_config = None
+        self.pending_config = {}
         
         # get user configuration
         self.logger.info('Fetching user configuration.')
-        self.configuration = self.get_config()
+        self.configuration, errors = config.validate(self.get_config())
+        for error in errors:
+            self.logger.warn('Configuration: %s', error)
+
+        # apply log configuration
+        self.apply_log_configuration()
 
-        # set QT style from style sheet
+        # serve commands of qontrolctl.py, and of later launches of Qontrol,
+        # before anything is shown or reserved on X
         try:
-            self.setStyleSheet(QtCore.QString(self.get_style()))
-            self.logger.info('Style is set.')
-        except Exception as error:
-            self.logger.error('There was a problem while applying style: '+\
-                               error.strerror+' Running without style.')
-            # the stylsheet string may be damaged, run without style
-            pass
+            self.control_server = control.ControlServer(self,
+                                    os.path.join(self.directories['main'],
+                                                 'ctl.sock'),
+                                    self.logger)
+        except control.ControlError as error:
+            self.logger.warn('Qontrol is already running (%s), quitting.',
+                             error)
+            sys.exit(0)
+        self.connect(self, QtCore.SIGNAL('aboutToQuit()'),
+                     self.control_server.close)
+
+        # prepare themes for QT style sheets
+        self.theme_compiler = theme.ThemeCompiler(
+                    [self.directories['thm'],
+                     os.path.join(os.path.dirname(os.path.abspath(__file__)), 'thm')],
+                    self.directories['cache'], self.logger)
+        self.theme_manager = theme.ThemeManager(self.theme_compiler, self.logger)
+        self.applied_sheets = {}
         
+        # record page plugins, their modules are imported when pages are built
+        self.plugins = plugins.PluginRegistry(
+                    [self.directories['plg'],
+                     os.path.dirname(os.path.abspath(__file__))], self.logger)
+
+        # refreshes of pages and indicators, coalesced on shared ticks
+        self.scheduler = scheduler.RefreshScheduler(self, self.logger)
+
+        # indicator states posted by pages, applied once per frame
+        self.indicators = indicators.IndicatorPipeline(self, self.logger)
+
+        # pools running the data jobs of pages
+        self.providers = providers.ProviderPool(
+                    self.configuration.providers.threads, process_pool,
+                    self.logger)
+        self.connect(self, QtCore.SIGNAL('aboutToQuit()'), self.providers.close)
+
         # Instantiate windows from class befitting orientation in configuration
         # If error in configuration, southward orientation becomes default
-        self.dashboard = dashboard.Dashboard(self.configuration['orientation'])
+        self.dashboard = dashboard.Dashboard(self.configuration.orientation)
+        self.panel = panel.Panel(self.configuration.orientation)
+
+        # set style on the windows before they are first polished
+        self.apply_style()
+        # pre-parse the other themes for switching at runtime
+        self.theme_manager.preload(self.configuration.orientation)
+
         self.dashboard.show()
-        self.panel = panel.Panel(self.configuration['orientation'])
         self.panel.show()
         self.logger.info('Request was made to paint the Dashboard and Panel.')
         
@@ -111,9 +174,234 @@ class Application(QtGui.QApplication):
         self.x_window = xwindow.Window(self.panel.winId())
         self.x_window.reserve_space(*self.panel.reserved_space)
         self.logger.info('Reserved space for window was requested from X.')
+
+        # apply changes to the configuration file while running
+        self.watch_config()
+
+        # let outside scripts set indicators through files
+        self.indicator_channel = channel.IndicatorChannel(self,
+                                                self.directories['ind'],
+                                                self.logger)
+        self.connect(self, QtCore.SIGNAL('aboutToQuit()'),
+                     self.indicator_channel.close)
+
+
+        # save runtime configuration changes once they settle, or on quit
+        self.save_timer = QtCore.QTimer(self)
+        self.save_timer.setSingleShot(True)
+        self.save_timer.setInterval(2000)
+        self.connect(self.save_timer, QtCore.SIGNAL('timeout()'),
+                     self.save_config)
+        self.connect(self, QtCore.SIGNAL('aboutToQuit()'),
+                     self.save_pending_config)
         
 
     
+    def apply_log_configuration(self):
+
+        """
+            Passes the log configuration to the logger.
+        """
+
+        log_configuration = self.configuration.log
+        # drop log records below the configured level from now on
+        self.logger.set_level(log_configuration.level)
+        # write text or json records
+        self.logger.set_format(log_configuration.format)
+        # keep that many records in memory for the log page
+        self.logger.set_ring_size(log_configuration.ring_size)
+        # rotate the active file past that size
+        self.logger.set_rotation(log_configuration.max_size)
+        # prune old log files in the background, and after each rotation
+        self.logger.clean_up(log_configuration.max_files,
+                             log_configuration.max_bytes,
+                             log_configuration.max_age)
+
+
+    def apply_style(self, changed_only=True):
+
+        """
+            Sets the configured style on the Panel, the Dashboard and the Stack,
+            scoped for the current orientation so that widgets are not matched
+            against the rules of every orientation. Only widgets whose sheet
+            differs from the one they have are repolished, unless changed_only
+            is off, eg. for newly built widgets.
+        """
+
+        try:
+            sheets = self.get_style()
+            widgets = {'panel' : self.panel,
+                       'dashboard' : self.dashboard,
+                       'stack' : self.dashboard.stack}
+            for scope, widget in widgets.iteritems():
+                if changed_only and self.applied_sheets.get(scope) == sheets[scope]:
+                    continue
+                widget.setStyleSheet(QtCore.QString(sheets[scope]))
+            self.applied_sheets = sheets
+            # page snapshots were drawn with the former style
+            self.dashboard.stack.clear_snapshots()
+            self.logger.info('Style is set.')
+        except Exception as error:
+            self.logger.error('There was a problem while applying style: %s '
+                              'Running without style.', error)
+            # the stylsheet string may be damaged, run without style
+            pass
+
+
+    def set_theme(self, name):
+
+        """
+            Switches to the named theme at once and keeps it as configured style.
+        """
+
+        self.update_config(None, 'style', name)
+
+
+    def watch_config(self):
+
+        """
+            Watches the configuration file and reloads it shortly after it
+            changed. The directory is watched too, since editors often replace
+            the file rather than write to it.
+        """
+
+        self.config_address = os.path.join(self.directories['cnf'], 'user.cnf')
+
+        # wait for a burst of changes to settle before reloading
+        self.reload_timer = QtCore.QTimer(self)
+        self.reload_timer.setSingleShot(True)
+        self.reload_timer.setInterval(250)
+        self.connect(self.reload_timer, QtCore.SIGNAL('timeout()'),
+                     self.reload_config)
+
+        self.config_watcher = QtCore.QFileSystemWatcher(self)
+        self.config_watcher.addPath(self.directories['cnf'])
+        if os.path.exists(self.config_address):
+            self.config_watcher.addPath(self.config_address)
+        self.connect(self.config_watcher, QtCore.SIGNAL('fileChanged(QString)'),
+                     lambda path: self.reload_timer.start())
+        self.connect(self.config_watcher,
+                     QtCore.SIGNAL('directoryChanged(QString)'),
+                     lambda path: self.reload_timer.start())
+
+
+    def reload_config(self):
+
+        """
+            Reads the configuration file again and applies what changed.
+            A file that cannot be read or parsed is ignored, the running
+            configuration is kept until it is fixed. Invalid values keep their
+            running value. The file as Qontrol wrote it is not reloaded, and
+            runtime changes not saved yet are kept over the file.
+        """
+
+        # a replaced file is no longer watched, watch the new one
+        if os.path.exists(self.config_address) and \
+           self.config_address not in self.config_watcher.files():
+            self.config_watcher.addPath(self.config_address)
+
+        try:
+            configuration_file = open(self.config_address, 'r')
+            try:
+                content = configuration_file.read()
+            finally:
+                configuration_file.close()
+            if content == self.written_config:
+                # Qontrol's own save
+                return
+            raw_configuration = json.loads(content)
+        except (IOError, ValueError) as error:
+            self.logger.warn('Configuration was not reloaded: %s', error)
+            return
+
+        if isinstance(raw_configuration, dict):
+            for (section, key), value in self.pending_config.iteritems():
+                if section is None:
+                    raw_configuration[key] = value
+                elif isinstance(raw_configuration.get(section), dict):
+                    raw_configuration[section][key] = value
+
+        configuration, errors = config.validate(raw_configuration,
+                                                self.configuration)
+        for error in errors:
+            self.logger.warn('Configuration: %s', error)
+
+        changed = configuration.changed(self.configuration)
+        if not changed:
+            return
+
+        self.logger.info('Configuration changed: %s', ', '.join(sorted(changed)))
+        old_configuration = self.configuration
+        self.configuration = configuration
+        self.apply_config_changes(old_configuration, changed)
+
+
+    def apply_config_changes(self, old_configuration, changed):
+
+        """
+            Updates only the parts of the application affected by the changed
+            sections of the configuration.
+        """
+
+        if 'log' in changed:
+            self.apply_log_configuration()
+
+        if 'animation' in changed:
+            self.dashboard.animation.configure(self.configuration.animation)
+
+        if 'providers' in changed:
+            self.providers.configure(self.configuration.providers.threads)
+            if old_configuration.providers.processes != \
+               self.configuration.providers.processes:
+                self.logger.warn('Changes to provider processes take effect '
+                                 'on restart.')
+
+        old_dashboard = old_configuration.dashboard
+        new_dashboard = self.configuration.dashboard
+        if old_dashboard.pages != new_dashboard.pages:
+            self.logger.warn('Changes to dashboard pages take effect on restart.')
+        if old_dashboard.memory_budget != new_dashboard.memory_budget:
+            self.dashboard.stack.enforce_budget()
+
+        if 'orientation' in changed:
+            # only the orientated widgets are rebuilt, pages are kept
+            self.dashboard.set_orientation(self.configuration.orientation)
+            self.rebuild_panel()
+        elif 'panel' in changed:
+            self.panel.apply_configuration()
+            self.x_window.reserve_space(*self.panel.reserved_space)
+
+        # the dashboard position depends on the panel thickness
+        if 'panel' in changed or old_dashboard.ratio != new_dashboard.ratio:
+            self.dashboard.apply_configuration()
+
+        # style is scoped by orientation, rebuilt widgets need it too
+        if 'orientation' in changed:
+            self.apply_style(changed_only=False)
+        elif 'style' in changed:
+            self.apply_style()
+
+
+    def rebuild_panel(self):
+
+        """
+            Replaces the panel with one of the configured orientation, handing
+            over the page indicators, and reserves its space on X.
+        """
+
+        old_panel = self.panel
+        old_panel.bar.release_buttons()
+        self.panel = panel.Panel(self.configuration.orientation)
+        self.panel.show()
+        old_panel.hide()
+        old_panel.deleteLater()
+
+        # the X connection is kept, only the window changes
+        self.x_window.set_window(self.panel.winId())
+        self.x_window.reserve_space(*self.panel.reserved_space)
+        self.logger.info('Panel was rebuilt and reserved space requested.')
+
+
     def make_directories(self):
         
         """
@@ -133,111 +421,26 @@ class Application(QtGui.QApplication):
     def get_style(self):
 
         """
-            This method will try to get a custom style from the user directory.
+            This method will get the style requested in configuration, from
+            the user directory first, then from the root directory, split in
+            sheets for the Panel, the Dashboard and the Stack.
             If it fails, it will use the default style instead.
         """
         
         # check which style is requested in configuration
-        try:
-            style_name = self.configuration['style']
-            self.logger.info('Requested style is "'+style_name+'".')
-        except Exception as error:
-            # there is something wrong with the configuration it must be reset
-            self.logger.warn('There was a problem with the configuration: '+error.strerror)
-            self.configuration = self.get_config()
-            self.logger.info('Reverting to default style.')
-            style_name = 'default'
-        
-        # look for the style in the user path
-        try:
-            self.logger.info('Trying to open style from user directory.')
-            style_address = os.path.join(self.directories['thm'], style_name)
-            style_file = open(style_address, 'r')
-        except Exception as error:
-            self.logger.warn('There was a problem opening style sheet: '+error.strerror)
-            # the file is not to be found in the user's path or
-            # the directory does not exist
-            # make sure directory exists:
-            self.make_directories()
-        
-            # look for the style in the current root path
-            try:
-                self.logger.info('Trying to open style from root directory.')
-                style_address = os.path.join(os.path.dirname(__file__), 'thm', style_name)
-                style_file = open(style_address, 'r')
-            except Exception as error:
-                self.logger.warn('There was a problem loading the stylesheet: '+error.strerror)
-                # the file does not exist
-                # revert to default style and try again if it wasn't so
-                if style_name != 'default':
-                    self.logger.info('Reverting to default style.')
-                    style_name = 'default'
-                    # look for the style in the current root path
-                    try:
-                        style_address = os.path.join(os.path.dirname(__file__), 'thm', style_name)
-                        style_file = open(style_address, 'r')
-                    except Exception as error:
-                        self.logger.warn('There was a problem loading default style: '+\
-                            error.strerror+' Running without style instead')
-                        # then there is no style found, run without style
-                        return ''
-                else:
-                    self.logger.warn('There was a problem loading default style. '+\
-                        error.strerror+' Running without style instead')
-                    # then there is no style found, run without style
-                    return ''
-            
-        # try to read the style file obtained
-        try:        
-            style = style_file.read()
-        except Exception as error:
-            self.logger.warn('There was a problem reading the stylesheet: '+error.strerror)
-            # the style file was unreadable
-            # try default style if it wasn't so
-            if style_name != 'default':
-                self.logger.info('Reverting to default style.')
-                style_name = 'default'
-                # look for the style in the current root path
-                try:
-                    style_address = os.path.join(os.path.dirname(__file__), 'thm', style_name)
-                    style_file = open(style_address, 'r')
-                except Exception as error:
-                    self.logger.warn('There was a problem loading default style: '+\
-                        error.strerror+' Running without style instead.')
-                # then there is no style file found, run without style
-                    return ''
-                # try to read default if found                
-                try:
-                    style = style_file.read()
-                except Exception as error:
-                    self.logger.warn('There was a problem reading default style. '+\
-                        error.strerror+' Running without style instead.')
-                    # the default style was unreadable, run without style
-                    style_file.close()
-                    return ''
-            else:
-                self.logger.warn('There was a problem reading default style. '+\
-                        error.strerror+' Running without style instead')
-                # the default style was already in request and unreadable, run without style
-                return ''
-            
-        # try to close file
-        try:
-            style_file.close()
-        except Exception as error:
-            self.logger.warn('There was a problem closing the stylesheet: '+error.strerror)
-            # could not close the file, but no big deal
-            pass 
-            
-        # return style to main application
-        return style
+        style_name = self.configuration.style
+        self.logger.info('Requested style is "%s".', style_name)
+
+        return self.theme_manager.sheets(style_name,
+                                         self.configuration.orientation)
 
 
     def get_config(self):
         
         """
             This method will try to get the user configuration.
-            If it fails, it will make reset the configuration.
+            If it fails, it will make reset the configuration. A file that
+            cannot be parsed is kept as user.cnf.invalid.
         """
         
         # define address of user configuration        
@@ -263,21 +466,34 @@ class Application(QtGui.QApplication):
                         return self.set_config()
                     else:
                     # something else went wrong
-                        self.logger.error('There was an error loading the configuration file: '+ \
-                                         error.strerror)
+                        self.logger.error('There was an error loading the configuration file: %s',
+                                          error)
+                        return self.default_configuration
             else:
-            # something else went wrong
-                self.logger.error('There was an error loading the configuration file: '+ \
-                                    error.strerror)
+            # something else went wrong, the file is left as it is
+                self.logger.error('There was an error loading the configuration file: %s',
+                                  error)
+                return self.default_configuration
         
         # we can proceed with loading the configuration
         try:
-            configuration = json.loads(configuration_file.read())
-        except Exception as error:
-            self.logger.warn('There was a problem reading the configuration file: '+ \
-                             error.strerror)
-            # there was a problem reading the configuration file
-            # it will be reset to default
+            try:
+                configuration = json.loads(configuration_file.read())
+            finally:
+                configuration_file.close()
+        except (IOError, ValueError) as error:
+            self.logger.warn('There was a problem reading the configuration file: %s',
+                             error)
+            # there was a problem reading the configuration file, it is
+            # moved aside for the user to fix and reset to default
+            try:
+                os.rename(address, address+'.invalid')
+            except OSError as error:
+                self.logger.error('The configuration file could not be moved '
+                                  'aside, defaults are used: %s', error)
+                return self.default_configuration
+            self.logger.warn('The configuration file was moved to %s.',
+                             address+'.invalid')
             return self.set_config()
         # if all is well:
         return configuration
@@ -294,50 +510,147 @@ class Application(QtGui.QApplication):
         address = os.path.join(self.directories['cnf'], 'user.cnf')
         self.logger.info('A new configuration file will be created at '+address)
         
-        # try to open it        
-        try:
-            configuration_file = open(address, 'w')
-        except IOError as error:
-            if error[0] == 2:
-                self.logger.info('The path of the address is missing.')
-                # in that case the path does not exist
-                # and it should be created with make_directories
-                self.make_directories()
-                try:
-                    # try getting the configuration again
-                    configuration_file = open(address, 'w')
-                except Exception as error:
-                    # something else went wrong
-                    self.logger.error('There was a problem creating a configuration file: '+ \
-                                        error.strerror)
-            else:
-                # something else went wrong
-                self.logger.error('There was a problem creating a configuration file'+ \
-                                   error.strerror)
-        except Exception as error:
-                # something else went wrong
-                self.logger.error('There was a problem creating a configuration file: '+ \
-                                    error.strerror)
-        
-        # try to write to file
-        try:
-            configuration_file.write(json.dumps(self.default_configuration))
-        except Exception as error:
-            # something went wrong
-            self.logger.error('There was a problem writing to the configuration file: '+ \
-                               error.strerror)
+        # make sure the path exists
+        if not os.path.isdir(self.directories['cnf']):
+            self.logger.info('The path of the address is missing.')
+            self.make_directories()
         
-        # try to close:
-        try:
-            configuration_file.close()
-        except Exception as error:
-            # something went wrong
-            self.logger.warn('There was a problem closing the configuration file: '+ \
-                              error.strerror)
+        # write it
+        self.write_config(self.default_configuration)
         
         # return default configuration to the main application:
         return self.default_configuration
 
+
+    def write_config(self, values):
+
+        """
+            Writes the configuration file atomically: the values are written
+            and synced to a temporary file, which then replaces the file.
+            A crash at any point leaves either the old or the new file.
+        """
+
+        address = os.path.join(self.directories['cnf'], 'user.cnf')
+        temporary_address = address+'.tmp'
+        content = json.dumps(values, indent=4, sort_keys=True)
+        try:
+            configuration_file = open(temporary_address, 'w')
+            try:
+                configuration_file.write(content)
+                configuration_file.flush()
+                os.fsync(configuration_file.fileno())
+            finally:
+                configuration_file.close()
+            os.rename(temporary_address, address)
+        except (IOError, OSError) as error:
+            self.logger.error('There was a problem writing the configuration file: %s',
+                              error)
+            return False
+        # the watcher is told of this write too, see reload_config
+        self.written_config = content
+        return True
+
+
+    def update_config(self, section, key, value):
+
+        """
+            Changes a configuration value at runtime, eg.
+            update_config('dashboard', 'ratio', 0.6), or a top-level one with
+            section None. The change is applied at once and saved after a
+            short delay, so a burst of changes is written only once.
+        """
+
+        values = self.configuration.as_dict()
+        if section is None:
+            values[key] = value
+        else:
+            values[section][key] = value
+
+        configuration, errors = config.validate(values, self.configuration)
+        for error in errors:
+            self.logger.warn('Configuration: %s', error)
+
+        changed = configuration.changed(self.configuration)
+        if not changed:
+            return
+
+        old_configuration = self.configuration
+        self.configuration = configuration
+        self.apply_config_changes(old_configuration, changed)
+        self.pending_config[(section, key)] = value
+
+        # (re)start the delay, the latest values are written when it ends,
+        # unless changes keep coming for longer than the maximum delay
+        if not self.save_timer.isActive():
+            self.save_pending_since = time.time()
+        if time.time() - self.save_pending_since > 10:
+            self.save_config()
+        else:
+            self.save_timer.start()
+
+
+    def save_pending_config(self):
+
+        """
+            Saves changes still waiting for the save delay to end, or not
+            saved yet.
+        """
+
+        if self.pending_config:
+            self.save_config()
+
+
+    def save_config(self):
+
+        """
+            Writes the pending runtime changes to file. Only their keys are
+            changed in the file as the user wrote it, unknown keys and values
+            replaced by defaults are kept. A file that cannot be parsed is
+            left alone until it is fixed.
+        """
+
+        if self.save_timer.isActive():
+            self.save_timer.stop()
+        if not self.pending_config:
+            return
+
+        try:
+            configuration_file = open(self.config_address, 'r')
+            try:
+                values = json.loads(configuration_file.read())
+            finally:
+                configuration_file.close()
+        except IOError as error:
+            if error[0] != 2:
+                self.logger.error('Configuration was not saved: %s', error)
+                return
+            # no file anymore, the running configuration is written
+            values = self.configuration.as_dict()
+        except ValueError as error:
+            self.logger.warn('Configuration was not saved, the file cannot be '
+                             'parsed: %s', error)
+            return
+        if not isinstance(values, dict):
+            self.logger.warn('Configuration was not saved, the file does not '
+                             'hold an object.')
+            return
+
+        changed = False
+        for (section, key), value in self.pending_config.iteritems():
+            entries = values
+            if section is not None:
+                if not isinstance(values.get(section), dict):
+                    values[section] = {}
+                entries = values[section]
+            if entries.get(key) != value:
+                entries[key] = value
+                changed = True
+
+        if not changed or self.write_config(values):
+            self.pending_config.clear()
+            if changed:
+                self.logger.info('Configuration saved.')
+
    
 
 
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+
+"""
+    Command-line client of the control socket of a running Qontrol, eg.
+        python qontrolctl.py toggle
+        python qontrolctl.py page Log
+        python qontrolctl.py indicator Log count=3 urgency=high
+    See control.py for the commands. Imports are kept to a minimum so that it
+    answers a hotkey at once: no PyQt.
+    Exits with 0 if the command succeeded, 1 if it failed, 2 if no Qontrol
+    is running.
+"""
+
+import os
+import sys
+import socket
+
+__version__ = "11.09.06.14.38"
+
+
+address = os.path.expanduser('~/.qontrol/ctl.sock')
+
+
+def quote(word):
+
+    """
+        Quotes the word for the shell-like parsing of the server.
+    """
+
+    if word and not any(character in word for character in ' \t"\'\\'):
+        return word
+    return '"'+word.replace('\\', '\\\\').replace('"', '\\"')+'"'
+
+
+def send(line, timeout=2.0):
+
+    """
+        Sends a request line and returns the answer line. Raises socket.error
+        if no Qontrol is listening.
+    """
+
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.settimeout(timeout)
+        connection.connect(address)
+        connection.sendall(line+'\n')
+        answer = ''
+        while not answer.endswith('\n'):
+            data = connection.recv(4096)
+            if not data:
+                break
+            answer += data
+        return answer.strip()
+    finally:
+        connection.close()
+
+
+def forward(arguments):
+
+    """
+        Hands the arguments of a second launch of qontrol.py over to the
+        running Qontrol. Returns False if none is running, to go on starting.
+    """
+
+    try:
+        answer = send(' '.join(['launch'] + [quote(word) for word in arguments]))
+    except socket.timeout:
+        print >> sys.stderr, 'Qontrol is running but does not answer.'
+        return True
+    except socket.error:
+        # no socket, or one left behind by a Qontrol that did not quit cleanly
+        return False
+    if answer != 'ok':
+        print >> sys.stderr, answer
+    return True
+
+
+def main(arguments):
+    if not arguments:
+        print >> sys.stderr, 'usage: qontrolctl.py COMMAND [ARGUMENT...]'
+        return 1
+    try:
+        answer = send(' '.join(quote(word) for word in arguments))
+    except socket.error as error:
+        print >> sys.stderr, 'Qontrol is not running (%s).' % error
+        return 2
+    if answer != 'ok':
+        print >> sys.stderr, answer
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+
+    sys.exit(main(sys.argv[1:]))
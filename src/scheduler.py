@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+
+"""
+    Refresh scheduler shared by the pages and indicators of Qontrol.
+
+    Rather than each running its own QTimer, pages register refresh callbacks
+    with a period and a slack, the delay by which a refresh may come late:
+        self.register_refresh(self.update_view, 1000, 500)
+    The scheduler wakes up once for every callback due by the earliest
+    deadline, so that callbacks of close periods share the same ticks.
+    Callbacks of suspended pages are not run and do not wake it up.
+"""
+
+import time
+import collections
+
+from PyQt4 import QtCore
+
+__version__ = "11.09.06.14.38"
+
+
+
+class Refresh(object):
+
+    """
+        Registered refresh callback. page is None for callbacks that run
+        whatever the dashboard shows, eg. for indicators.
+    """
+
+    def __init__(self, callback, period, slack, page):
+        self.callback = callback
+        self.period = period
+        self.slack = slack
+        self.page = page
+        # time at which the callback is next due
+        self.due = time.time() + period
+
+    def is_active(self):
+        return self.page is None or self.page.active
+
+
+
+class RefreshScheduler(QtCore.QObject):
+
+    """
+        Runs the registered callbacks on shared ticks of one QTimer.
+        Periods and slacks are in milliseconds.
+    """
+
+    def __init__(self, parent, logger, report_interval=60):
+        QtCore.QObject.__init__(self, parent)
+        self.logger = logger
+        self.refreshes = []
+
+        self.timer = QtCore.QTimer(self)
+        self.timer.setSingleShot(True)
+        self.connect(self.timer, QtCore.SIGNAL('timeout()'), self.tick)
+
+        # times of the last wakeups, to report their rate
+        self.wakeups = collections.deque()
+        self.report_interval = report_interval
+        self.reported = time.time()
+
+
+    def register(self, callback, period, slack=None, page=None):
+
+        """
+            Calls callback every period ms, up to slack ms late, by default a
+            quarter of the period. Returns the Refresh to unregister.
+        """
+
+        if slack is None:
+            slack = period / 4
+        refresh = Refresh(callback, period / 1000.0, slack / 1000.0, page)
+        self.refreshes.append(refresh)
+        self.reschedule()
+        return refresh
+
+
+    def unregister(self, refresh):
+        if refresh in self.refreshes:
+            self.refreshes.remove(refresh)
+            self.reschedule()
+
+
+    def unregister_page(self, page):
+        self.refreshes = [refresh for refresh in self.refreshes
+                          if refresh.page is not page]
+        self.reschedule()
+
+
+    def reschedule(self):
+
+        """
+            Sets the timer for the earliest deadline of the active callbacks,
+            or stops it if there is none.
+        """
+
+        deadlines = [refresh.due + refresh.slack for refresh in self.refreshes
+                     if refresh.is_active()]
+        if not deadlines:
+            self.timer.stop()
+            return
+        delay = max(min(deadlines) - time.time(), 0)
+        self.timer.start(int(delay * 1000))
+
+
+    def tick(self):
+
+        """
+            Runs every active callback due by now, then waits for the next
+            deadline.
+        """
+
+        now = time.time()
+        self.wakeups.append(now)
+
+        for refresh in list(self.refreshes):
+            if refresh.due > now or not refresh.is_active():
+                continue
+            # next periods count from this tick, keeping callbacks together
+            refresh.due = now + refresh.period
+            try:
+                refresh.callback()
+            except Exception as error:
+                self.logger.error('Refresh %s failed: %s', refresh.callback,
+                                  error)
+
+        if now - self.reported >= self.report_interval:
+            self.logger.info('Refresh scheduler: %.2f wakeups per second.',
+                             self.wakeup_rate(now))
+            self.reported = now
+
+        self.reschedule()
+
+
+    def wakeup_rate(self, now=None):
+
+        """
+            Returns the wakeups per second over the report interval.
+        """
+
+        if now is None:
+            now = time.time()
+        while self.wakeups and self.wakeups[0] < now - self.report_interval:
+            self.wakeups.popleft()
+        return len(self.wakeups) / float(self.report_interval)
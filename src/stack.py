@@ -1,5 +1,7 @@
 #!/usr/bin/env python
 
+import itertools
+
 from PyQt4 import QtGui, QtCore
 
 import pages
@@ -17,9 +19,15 @@ class Stack(QtGui.QFrame):
      
     """
         Frame with stacked layout for the dashboard, holding pages.    
+        Page descriptors are made from configuration, unless descriptors taken
+        from another stack are given. The layout holds an empty slot for each
+        page, a page is only built the first time its index is selected, or
+        while idle if the dashboard pre-warm option is set.
+        Once the pages built use more than the dashboard memory budget, the
+        least recently shown ones are released, to be rebuilt when selected.
     """
 
-    def __init__(self, parent):
+    def __init__(self, parent, descriptors=None):
         QtGui.QFrame.__init__(self, parent)
 
                 # Get the QApplication's instance
@@ -31,29 +39,281 @@ class Stack(QtGui.QFrame):
 
         # Reference orientation
         self.orientation = self.parent().orientation
-        self.logger.info('Stack has orientation '+self.orientation)
+        self.logger.info('Stack has orientation %s', self.orientation)
 
         # Set Geometry
-        self.setFixedSize(self.parent().maximumWidth(), 
-                          self.parent().maximumHeight())
-        self.logger.info('Size of stack set to:'+ \
-                          str(self.maximumWidth())+'*'+str(self.maximumHeight()))
+        self.set_size()
 
         # Set layout
         self.layout = QtGui.QStackedLayout()
         self.layout.setContentsMargins(20, 20, 20, 20)
         self.setContentsMargins(20, 20, 20, 0)
         
-        # Set pages
-        for name in self.application.configuration['dashboard']['pages']:
-            page = pages.DummyPage(self, name)
+        # Set page slots, pages themselves are built on demand
+        dashboard_configuration = self.application.configuration.dashboard
+        if descriptors is None:
+            self.descriptors = []
+            for entry in dashboard_configuration.pages:
+                if isinstance(entry, basestring):
+                    page_type = pages.page_types.get(entry, pages.DummyPage)
+                    entry = {'name' : entry,
+                             'module' : 'pages',
+                             'class' : page_type.__name__}
+                plugin = self.application.plugins.register(entry['module'],
+                                                           entry['class'])
+                self.descriptors.append(pages.PageDescriptor(entry['name'],
+                                                             plugin))
+        else:
+            self.descriptors = descriptors
 
-            self.layout.addWidget(page)
+        for descriptor in self.descriptors:
+            if descriptor.slot is None:
+                descriptor.slot = self.make_slot()
+            self.layout.addWidget(descriptor.slot)
         
         self.setLayout(self.layout)
 
         count = self.layout.count()
-        self.logger.info(str(count)+" pages were appended to dashboard stack.")
+        self.logger.info("%d pages were appended to dashboard stack.", count)
+
+        # Show the page last selected
+        if descriptors is None and count:
+            current_page = dashboard_configuration.current_page
+            self.layout.setCurrentIndex(min(current_page, count - 1))
+
+        # Pages are active only while current on a shown dashboard
+        self.dashboard_shown = False
+        # counts page uses, for releasing the least recently used pages
+        self.uses = itertools.count(1)
+
+        # Build pages as they get selected
+        self.connect(self.layout, QtCore.SIGNAL('currentChanged(int)'),
+                     self.current_changed)
+
+        # Pages left to build while the event loop is idle
+        self.prewarm_queue = []
+        self.prewarm_timer = QtCore.QTimer(self)
+        self.prewarm_timer.setSingleShot(True)
+        self.prewarm_timer.setInterval(0)
+        self.connect(self.prewarm_timer, QtCore.SIGNAL('timeout()'),
+                     self.prewarm_next)
+        if dashboard_configuration.prewarm:
+            self.start_prewarm()
+
+
+    def make_slot(self):
+
+        """
+            Returns an empty widget holding the place of a page in the layout.
+        """
+
+        slot = QtGui.QWidget()
+        layout = QtGui.QHBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        slot.setLayout(layout)
+        return slot
+
+
+    def build_page(self, index):
+
+        """
+            Returns the page at index, building it if it is the first time.
+        """
+
+        if not 0 <= index < len(self.descriptors):
+            return None
+        descriptor = self.descriptors[index]
+        if descriptor.page is None:
+            descriptor.build()
+            self.logger.info('Page %s was built.', descriptor.name)
+            self.enforce_budget(keep=descriptor)
+        return descriptor.page
+
+
+    def memory_usage(self):
+        return sum(descriptor.page.memory_usage()
+                   for descriptor in self.descriptors
+                   if descriptor.page is not None)
+
+
+    def enforce_budget(self, keep=None):
+
+        """
+            Releases pages, least recently shown first, until the pages built
+            fit in the memory budget. The current page and keep are never
+            released. A budget of 0 means no limit.
+        """
+
+        budget = self.application.configuration.dashboard.memory_budget
+        if not budget:
+            return
+        usage = self.memory_usage()
+        if usage <= budget:
+            return
+
+        current = self.layout.currentIndex()
+        candidates = sorted((descriptor for index, descriptor
+                             in enumerate(self.descriptors)
+                             if descriptor.page is not None and
+                             index != current and descriptor is not keep),
+                            key=lambda descriptor: descriptor.last_used)
+        for descriptor in candidates:
+            if usage <= budget:
+                break
+            page_usage = descriptor.page.memory_usage()
+            descriptor.release()
+            usage -= page_usage
+            self.logger.info('Page %s was released, %d bytes over budget.',
+                             descriptor.name, max(usage - budget, 0))
+
+
+    def build_current(self):
+        return self.build_page(self.layout.currentIndex())
+
+
+    def current_changed(self, index):
+        self.build_page(index)
+        self.update_lifecycle()
+        # pages grow while used, the one left may now be over budget
+        self.enforce_budget()
+
+
+    def snapshot(self):
+
+        """
+            Returns a pixmap of the stack showing the current page, grabbed
+            only if the page changed since the last one. Only the current
+            page keeps its snapshot.
+        """
+
+        page = self.build_current()
+        if page is not None and page.snapshot is not None:
+            return page.snapshot
+
+        self.clear_snapshots()
+        if page is not None:
+            page.descriptor.slot.layout().activate()
+        self.layout.activate()
+
+        # keep the translucency of the stack
+        pixmap = QtGui.QPixmap(self.size())
+        pixmap.fill(QtCore.Qt.transparent)
+        self.render(pixmap, QtCore.QPoint(), QtGui.QRegion(),
+                    QtGui.QWidget.DrawWindowBackground |
+                    QtGui.QWidget.DrawChildren)
+        if page is not None:
+            page.snapshot = pixmap
+        return pixmap
+
+
+    def clear_snapshots(self):
+        for descriptor in self.descriptors:
+            if descriptor.page is not None:
+                descriptor.page.snapshot = None
+
+
+    def set_current_index(self, index):
+
+        """
+            Switches to the page at index, building it if needed.
+        """
+
+        if index != self.layout.currentIndex():
+            self.layout.setCurrentIndex(index)
+
+
+    def set_dashboard_shown(self, shown):
+
+        """
+            Tells the stack whether the dashboard is shown, to resume or
+            suspend the current page.
+        """
+
+        self.dashboard_shown = shown
+        if shown:
+            self.build_current()
+        self.update_lifecycle()
+
+
+    def update_lifecycle(self):
+
+        """
+            Resumes the current page if the dashboard is shown, and suspends
+            every other page built.
+        """
+
+        current = self.layout.currentIndex()
+        for index, descriptor in enumerate(self.descriptors):
+            if descriptor.page is None:
+                continue
+            if index == current and self.dashboard_shown:
+                if not descriptor.page.active:
+                    descriptor.last_used = next(self.uses)
+                descriptor.page.resume()
+            else:
+                descriptor.page.suspend(dashboard_hidden=(index == current))
+
+
+    def start_prewarm(self):
+
+        """
+            Queues the pages not built yet, current page first, to be built
+            one per pass of the event loop once it has nothing else to do.
+        """
+
+        current = self.layout.currentIndex()
+        order = [current] + [index for index in range(len(self.descriptors))
+                             if index != current]
+        self.prewarm_queue = [index for index in order
+                              if 0 <= index < len(self.descriptors) and
+                              self.descriptors[index].page is None]
+        if self.prewarm_queue:
+            self.prewarm_timer.start()
+
+
+    def prewarm_next(self):
+        if not self.prewarm_queue:
+            return
+        # building more would only release pages built before
+        budget = self.application.configuration.dashboard.memory_budget
+        if budget and self.memory_usage() >= budget:
+            self.prewarm_queue = []
+            return
+        self.build_page(self.prewarm_queue.pop(0))
+        if self.prewarm_queue:
+            self.prewarm_timer.start()
+
+
+    def set_size(self):
+
+        """
+            Fits the stack to the size of the dashboard.
+        """
+
+        self.setFixedSize(self.parent().maximumWidth(), 
+                          self.parent().maximumHeight())
+        self.logger.info('Size of stack set to: %d*%d',
+                          self.maximumWidth(), self.maximumHeight())
+
+
+    def take_pages(self):
+
+        """
+            Removes all page slots from the stack and returns the page
+            descriptors in order, for another stack to hold them. Pages not
+            built yet are left to the other stack to build.
+        """
+
+        self.prewarm_timer.stop()
+        self.prewarm_queue = []
+        self.set_dashboard_shown(False)
+        self.disconnect(self.layout, QtCore.SIGNAL('currentChanged(int)'),
+                        self.current_changed)
+        for descriptor in self.descriptors:
+            self.layout.removeWidget(descriptor.slot)
+        taken = self.descriptors
+        self.descriptors = []
+        return taken
 
             
 
@@ -67,29 +327,29 @@ class StackSouth(Stack):
     """
         Subclass of Stack oriented southwards.
     """
-    def __init__(self, parent):
-        Stack.__init__(self, parent)
+    def __init__(self, parent, descriptors=None):
+        Stack.__init__(self, parent, descriptors)
 
 class StackNorth(Stack):
     
     """
         Subclass of Stack oriented northwards.
     """
-    def __init__(self, parent):
-        Stack.__init__(self, parent)
+    def __init__(self, parent, descriptors=None):
+        Stack.__init__(self, parent, descriptors)
 
 class StackWest(Stack):
     
     """
         Subclass of Stack oriented westwards.
     """
-    def __init__(self, parent):
-        Stack.__init__(self, parent)
+    def __init__(self, parent, descriptors=None):
+        Stack.__init__(self, parent, descriptors)
 
 class StackEast(Stack):
     
     """
         Subclass of Stack oriented eastwards.
     """
-    def __init__(self, parent):
-        Stack.__init__(self, parent)
+    def __init__(self, parent, descriptors=None):
+        Stack.__init__(self, parent, descriptors)
@@ -0,0 +1,443 @@
+#!/usr/bin/env python
+
+"""
+    Theme compiler turning theme files into a Qt style sheet.
+
+    Theme files are Qt style sheets with two additions:
+        @import "name";            includes the theme file called name
+        @define name value;        defines a variable used as $name
+    Files whose name starts with an underscore are meant to be imported only.
+
+    A compiled style sheet is split by split_style into sheets scoped to the
+    Panel, the Dashboard and the Stack, leaving out the rules of the inactive
+    orientations, instead of being applied to the whole application.
+"""
+
+import os
+import sys
+import re
+import json
+import time
+import threading
+
+__version__ = "11.09.06.14.38"
+
+
+import_pattern = re.compile(r'@import\s+"([^"]+)"\s*;')
+define_pattern = re.compile(r'@define\s+([\w-]+)\s+([^;]+);')
+variable_pattern = re.compile(r'\$([\w-]+)')
+comment_pattern = re.compile(r'/\*.*?\*/', re.DOTALL)
+rule_pattern = re.compile(r'([^{}]+)\{([^{}]*)\}')
+type_pattern = re.compile(r'^\s*([A-Za-z_]\w*)')
+orientated_pattern = re.compile(r'\b([A-Za-z_]\w*?)(South|North|West|East)\b')
+
+# scoped sheet holding the rules of each widget class of Qontrol,
+# rules of other classes go to the sheets of both top-level windows
+scopes = {'Panel' : 'panel',
+          'Bar' : 'panel',
+          'Indicator' : 'panel',
+          'Dashboard' : 'dashboard',
+          'Stack' : 'stack',
+          'Page' : 'stack'}
+
+
+class ThemeError(Exception):
+    pass
+
+
+class ThemeCompiler(object):
+
+    """
+        Resolves a theme by name along the search path, preprocesses it and
+        caches the resulting style sheet in the cache directory.
+        The cache is keyed by the modification time and size of every file
+        and directory the result depends on, so a warm start only has to stat
+        those and read one file. Themes compiled during this run are also kept
+        in memory, under the same key.
+        It is shared by the GUI thread and the theme loader thread, one
+        compilation runs at a time.
+    """
+
+    def __init__(self, search_path, cache_path, logger):
+        self.search_path = search_path
+        self.cache_path = cache_path
+        self.logger = logger
+        # name: (key, style, sources) of the themes compiled so far
+        self.compiled = {}
+        # guards compiled and the cache files
+        self.lock = threading.Lock()
+
+
+    def compile(self, name):
+
+        """
+            Returns the style sheet of the named theme, from cache if it is
+            still valid. Falls back on the default theme, then on no style.
+        """
+
+        with self.lock:
+            return self._compile(name)
+
+
+    def _compile(self, name):
+        for theme_name in (name, 'default'):
+            if theme_name in self.compiled:
+                key, style, sources = self.compiled[theme_name]
+                if key == self.cache_key(sources):
+                    return style
+
+            style, sources = self.load_cache(theme_name)
+            if style is not None:
+                self.remember(theme_name, style, sources)
+                self.logger.info('Style "%s" loaded from cache.', theme_name)
+                return style
+
+            try:
+                style, sources = self.build(theme_name)
+            except ThemeError as error:
+                self.logger.warn('There was a problem compiling style "%s": %s',
+                                 theme_name, error)
+                continue
+
+            self.save_cache(theme_name, style, sources)
+            self.remember(theme_name, style, sources)
+            self.logger.info('Style "%s" compiled from %d files.', theme_name,
+                             len(sources))
+            return style
+
+        self.logger.warn('Running without style.')
+        return ''
+
+
+    def find(self, name):
+
+        """
+            Returns the path of the theme file called name, the user's
+            directory coming first in the search path.
+        """
+
+        for directory in self.search_path:
+            address = os.path.join(directory, name)
+            if os.path.isfile(address):
+                return address
+        raise ThemeError('no theme file "%s"' % name)
+
+
+    def build(self, name):
+
+        """
+            Preprocesses the named theme and returns the style sheet and the
+            list of files read.
+        """
+
+        sources = []
+        variables = {}
+        text = self.expand(name, sources, [])
+
+        # definitions apply to the whole sheet, wherever they are made
+        for variable, value in define_pattern.findall(text):
+            variables[variable] = value.strip()
+        text = define_pattern.sub('', text)
+
+        def substitute(match):
+            try:
+                return variables[match.group(1)]
+            except KeyError:
+                raise ThemeError('undefined variable $%s' % match.group(1))
+
+        return variable_pattern.sub(substitute, text), sources
+
+
+    def expand(self, name, sources, including):
+
+        """
+            Returns the text of the named theme file with its imports
+            replaced by their own expanded text.
+        """
+
+        if name in including:
+            raise ThemeError('"%s" imports itself' % name)
+
+        address = self.find(name)
+        try:
+            theme_file = open(address, 'r')
+            try:
+                text = theme_file.read()
+            finally:
+                theme_file.close()
+        except IOError as error:
+            raise ThemeError('cannot read %s: %s' % (address, error.strerror))
+        sources.append(address)
+
+        return import_pattern.sub(lambda match: self.expand(match.group(1),
+                                                            sources,
+                                                            including + [name]),
+                                  text)
+
+
+    def cache_key(self, sources):
+
+        """
+            Returns the modification time and size of the sources and of the
+            search path directories, where a new file could shadow a source.
+        """
+
+        key = []
+        for address in list(self.search_path) + list(sources):
+            try:
+                status = os.stat(address)
+            except OSError:
+                key.append([address, None, None])
+            else:
+                key.append([address, status.st_mtime, status.st_size])
+        return key
+
+
+    def remember(self, name, style, sources):
+        self.compiled[name] = (self.cache_key(sources), style, sources)
+
+
+    def cache_address(self, name):
+        return os.path.join(self.cache_path, 'theme-'+name+'.json')
+
+
+    def load_cache(self, name):
+
+        """
+            Returns the cached style sheet of the theme and its sources, None
+            and no sources if there is none or if any of its files changed.
+        """
+
+        try:
+            cache_file = open(self.cache_address(name), 'r')
+            try:
+                cache = json.load(cache_file)
+            finally:
+                cache_file.close()
+        except (IOError, ValueError):
+            return None, []
+
+        if cache.get('key') != self.cache_key(cache.get('sources', [])):
+            return None, []
+        return cache.get('style'), cache['sources']
+
+
+    def save_cache(self, name, style, sources):
+
+        """
+            Caches the style sheet of the theme. Failing to is not an error.
+        """
+
+        address = self.cache_address(name)
+        try:
+            if not os.path.isdir(self.cache_path):
+                os.makedirs(self.cache_path)
+            cache_file = open(address+'.tmp', 'w')
+            try:
+                json.dump({'sources' : sources,
+                           'key' : self.cache_key(sources),
+                           'style' : style}, cache_file)
+            finally:
+                cache_file.close()
+            os.rename(address+'.tmp', address)
+        except (IOError, OSError) as error:
+            self.logger.warn('Style could not be cached: %s', error)
+
+
+
+
+################################################################################
+###                             THEME MANAGER                                ###
+################################################################################
+
+class ThemeManager(object):
+
+    """
+        Keeps every theme found along the search path compiled and split for
+        the current orientation, so that switching theme only has to set the
+        sheets that differ. Themes are pre-parsed in a background thread.
+    """
+
+    def __init__(self, compiler, logger):
+        self.compiler = compiler
+        self.logger = logger
+        # (name, orientation): (style, sheets) of the themes split so far
+        self.split = {}
+        # guards split, shared with the theme loader thread
+        self.lock = threading.Lock()
+
+
+    def themes(self):
+
+        """
+            Returns the names of the themes along the search path, skipping
+            files meant to be imported only.
+        """
+
+        names = set()
+        for directory in self.compiler.search_path:
+            try:
+                entries = os.listdir(directory)
+            except OSError:
+                continue
+            for name in entries:
+                if not name.startswith(('_', '.')) and \
+                   os.path.isfile(os.path.join(directory, name)):
+                    names.add(name)
+        return sorted(names)
+
+
+    def preload(self, orientation):
+
+        """
+            Compiles and splits every theme in the background.
+        """
+
+        loader = threading.Thread(target=self._preload, name='ThemeLoader',
+                                  args=(orientation,))
+        loader.daemon = True
+        loader.start()
+
+
+    def _preload(self, orientation):
+        names = self.themes()
+        for name in names:
+            self.sheets(name, orientation)
+        self.logger.info('%d themes were pre-parsed.', len(names))
+
+
+    def sheets(self, name, orientation):
+
+        """
+            Returns the scoped sheets of the theme for the orientation,
+            compiling and splitting it only if it changed since last time.
+        """
+
+        style = self.compiler.compile(name)
+        with self.lock:
+            try:
+                split_from, sheets = self.split[(name, orientation)]
+                if split_from == style:
+                    return sheets
+            except KeyError:
+                pass
+            sheets = split_style(style, orientation)
+            self.split[(name, orientation)] = (style, sheets)
+            return sheets
+
+
+
+################################################################################
+###                          ORIENTATION SCOPES                              ###
+################################################################################
+
+def split_style(style, orientation):
+
+    """
+        Splits a style sheet into the sheets to set on the Panel, Dashboard
+        and Stack of the given orientation. Selectors naming a class of another
+        orientation, like StackNorth for a southward panel, are left out.
+        Returns a dictionary of the three sheets.
+    """
+
+    suffix = orientation.capitalize()
+    sheets = {'panel' : [], 'dashboard' : [], 'stack' : []}
+
+    for selectors, body in rule_pattern.findall(comment_pattern.sub('', style)):
+        # selectors of this rule kept for each sheet
+        scoped = {'panel' : [], 'dashboard' : [], 'stack' : []}
+
+        for selector in selectors.split(','):
+            selector = selector.strip()
+            if not selector:
+                continue
+            if any(match.group(2) != suffix
+                   for match in orientated_pattern.finditer(selector)):
+                continue
+
+            match = type_pattern.match(selector)
+            class_name = match.group(1) if match else ''
+            class_name = orientated_pattern.sub(r'\1', class_name)
+            if class_name.endswith('Page'):
+                class_name = 'Page'
+
+            if class_name in scopes:
+                scoped[scopes[class_name]].append(selector)
+            else:
+                scoped['panel'].append(selector)
+                scoped['dashboard'].append(selector)
+
+        for scope, kept in scoped.iteritems():
+            if kept:
+                sheets[scope].append(', '.join(kept)+' {'+body.strip()+'}')
+
+    return dict((scope, '\n'.join(rules)) for scope, rules in sheets.iteritems())
+
+
+def benchmark_theme(page_count=40, label_count=20, repeat=5):
+
+    """
+        Prints the time taken to polish a Qontrol-like widget tree with the
+        default theme set on the whole application, and with scoped sheets.
+    """
+
+    from PyQt4 import QtGui
+
+    class Panel(QtGui.QFrame): pass
+    class Bar(QtGui.QFrame): pass
+    class BarSouth(Bar): pass
+    class Dashboard(QtGui.QFrame): pass
+    class Stack(QtGui.QFrame): pass
+    class StackSouth(Stack): pass
+    class Page(QtGui.QFrame): pass
+
+    def make_tree():
+        panel = Panel()
+        bar = BarSouth(panel)
+        for index in range(page_count):
+            QtGui.QPushButton('Indicator', bar)
+        dashboard = Dashboard()
+        stack = StackSouth(dashboard)
+        for index in range(page_count):
+            page = Page(stack)
+            for label in range(label_count):
+                QtGui.QLabel('Label', page)
+        return panel, dashboard, stack
+
+    def polish(widget):
+        widget.ensurePolished()
+        for child in widget.findChildren(QtGui.QWidget):
+            child.ensurePolished()
+
+    application = QtGui.QApplication(sys.argv)
+    address = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           'thm', 'default')
+    style, sources = ThemeCompiler([os.path.dirname(address)], None,
+                                   None).build('default')
+    sheets = split_style(style, 'south')
+
+    print "A benchmark is run for theme (%d pages of %d labels):" % (page_count,
+                                                                     label_count)
+    for label in ('application', 'scoped'):
+        elapsed = 0
+        for run in range(repeat):
+            application.setStyleSheet(style if label == 'application' else '')
+            panel, dashboard, stack = make_tree()
+            start = time.time()
+            if label == 'scoped':
+                panel.setStyleSheet(sheets['panel'])
+                dashboard.setStyleSheet(sheets['dashboard'])
+                stack.setStyleSheet(sheets['stack'])
+            polish(panel)
+            polish(dashboard)
+            elapsed += time.time() - start
+            panel.deleteLater()
+            dashboard.deleteLater()
+            application.processEvents()
+        print '    %-12s %8.1f ms' % (label, elapsed / repeat * 1000)
+
+
+if __name__ == "__main__":
+
+    if 'benchmark' in sys.argv:
+        benchmark_theme()
@@ -17,6 +17,13 @@ class Window(object):
         self._window = self._display.create_resource_object('window', windowID)
 
 
+    def set_window(self, windowID):
+
+        """ Targets another window, on the same display connection. """
+
+        self._window = self._display.create_resource_object('window', windowID)
+
+
     def reserve_space(self, left=0, right=0, top=0, bottom=0):
 
         """ Reserves screen-space for toplevel window. """
@@ -36,5 +43,5 @@ class Window(object):
 
         """ Change state of the window. """
 
-        self._window.set_wm_state(Display().intern_atom('_NET_WM_STATE_SKIP_TASKBAR'))
+        self._window.set_wm_state(self._display.intern_atom('_NET_WM_STATE_SKIP_TASKBAR'))
 
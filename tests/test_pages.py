@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+
+"""
+    Tests of pages released to save memory and rebuilt. They need PyQt4 and
+    a display, and are skipped otherwise.
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+try:
+    from PyQt4 import QtGui
+except ImportError:
+    QtGui = None
+
+__version__ = "11.09.06.14.38"
+
+
+application = None
+
+def setUpModule():
+    global application
+    if QtGui is None or not os.environ.get('DISPLAY'):
+        return
+    import logger
+    import scheduler
+    application = QtGui.QApplication.instance() or QtGui.QApplication([])
+    application.log_path = tempfile.mkdtemp()
+    application.logger = logger.Logger(application.log_path, queued=False,
+                                       ring_size=200)
+    application.scheduler = scheduler.RefreshScheduler(application,
+                                                       application.logger)
+
+def tearDownModule():
+    if application is not None:
+        application.logger.close()
+        shutil.rmtree(application.log_path, ignore_errors=True)
+
+
+
+class LogPagePlugin(object):
+
+    def load(self):
+        import pages
+        return pages.LogPage
+
+
+
+@unittest.skipIf(QtGui is None or not os.environ.get('DISPLAY'),
+                 'needs PyQt4 and a display')
+class ReleaseTest(unittest.TestCase):
+
+    def setUp(self):
+        import pages
+        self.slot = QtGui.QWidget()
+        self.slot.setLayout(QtGui.QHBoxLayout())
+        self.slot.resize(300, 100)
+        self.slot.show()
+        self.descriptor = pages.PageDescriptor('Log', LogPagePlugin())
+        self.descriptor.slot = self.slot
+        for number in range(150):
+            application.logger.info('Record %d.', number)
+
+    def tearDown(self):
+        self.descriptor.release()
+        self.slot.deleteLater()
+
+    def test_released_page_keeps_scroll_position(self):
+        page = self.descriptor.build()
+        page.resume()
+        scroll_bar = page.view.verticalScrollBar()
+        self.assertTrue(scroll_bar.maximum() > 20)
+        scroll_bar.setValue(20)
+
+        self.descriptor.release()
+        self.assertEqual(self.descriptor.page, None)
+        self.assertEqual(self.descriptor.state, {'scroll' : 20})
+
+        page = self.descriptor.build()
+        page.resume()
+        self.assertEqual(page.view.verticalScrollBar().value(), 20)
+        self.assertTrue(page.view.blockCount() >= 150)
+
+    def test_released_page_follows_last_record(self):
+        page = self.descriptor.build()
+        page.resume()
+        self.descriptor.release()
+        self.assertEqual(self.descriptor.state, {'scroll' : None})
+
+        application.logger.info('Record after release.')
+        page = self.descriptor.build()
+        page.resume()
+        scroll_bar = page.view.verticalScrollBar()
+        self.assertEqual(scroll_bar.value(), scroll_bar.maximum())
+
+    def test_memory_usage_counts_held_data(self):
+        page = self.descriptor.build()
+        empty_usage = page.memory_usage()
+        self.assertTrue(empty_usage < 1024)
+        page.resume()
+        text_usage = page.memory_usage()
+        self.assertTrue(text_usage > empty_usage + 150 * 10)
+        page.snapshot = QtGui.QPixmap(10, 10)
+        self.assertEqual(page.memory_usage(),
+                         text_usage + 100 * page.snapshot.depth() / 8)
+
+
+
+if __name__ == "__main__":
+
+    unittest.main()
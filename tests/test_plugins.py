@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+
+"""
+    Tests of the page plugin registry. They need PyQt4, for pages.Page, and
+    are skipped otherwise.
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+try:
+    import PyQt4
+except ImportError:
+    PyQt4 = None
+
+__version__ = "11.09.06.14.38"
+
+
+plugin_module = '''
+import pages
+
+class GoodPage(pages.Page):
+    pass
+
+class NotAPage(object):
+    pass
+
+def page_function():
+    pass
+'''
+
+
+class Logger(object):
+
+    def __init__(self):
+        self.errors = []
+
+    def error(self, message, *args):
+        self.errors.append(message % args)
+
+    def info(self, message, *args):
+        pass
+
+    debug = info
+
+
+
+@unittest.skipIf(PyQt4 is None, 'needs PyQt4')
+class LoadTest(unittest.TestCase):
+
+    def setUp(self):
+        import plugins
+        self.directory = tempfile.mkdtemp()
+        module_file = open(os.path.join(self.directory, 'testplugin.py'), 'w')
+        try:
+            module_file.write(plugin_module)
+        finally:
+            module_file.close()
+        self.logger = Logger()
+        self.registry = plugins.PluginRegistry([self.directory], self.logger)
+
+    def tearDown(self):
+        sys.modules.pop('testplugin', None)
+        shutil.rmtree(self.directory)
+
+    def test_page_subclass_is_loaded(self):
+        import pages
+        plugin = self.registry.register('testplugin', 'GoodPage')
+        page_type = plugin.load()
+        self.assertTrue(issubclass(page_type, pages.Page))
+        self.assertEqual(self.logger.errors, [])
+
+    def test_other_class_is_refused(self):
+        import plugins
+        plugin = self.registry.register('testplugin', 'NotAPage')
+        self.assertRaises(plugins.PluginError, self.registry.load, plugin)
+
+    def test_function_is_refused(self):
+        import plugins
+        plugin = self.registry.register('testplugin', 'page_function')
+        self.assertRaises(plugins.PluginError, self.registry.load, plugin)
+        self.assertEqual(plugin.load(), None)
+        self.assertTrue('is not a Page subclass' in self.logger.errors[-1])
+
+
+
+if __name__ == "__main__":
+
+    unittest.main()